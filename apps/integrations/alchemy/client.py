@@ -1,4 +1,5 @@
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 from .exceptions import AlchemyError, AlchemyApiError, AlchemyConnectionError, AlchemyInvalidWalletError, AlchemyRateLimitError
 
@@ -7,6 +8,10 @@ class AlchemyClient:
 
     BASE_URL = "https://api.g.alchemy.com/data/v1/"
 
+    # Limits of the /assets/tokens/by-address endpoint
+    MAX_ADDRESSES_PER_REQUEST = 2
+    MAX_NETWORKS_PER_ADDRESS = 5
+
     def __init__(self, api_key=None):
         """
         Initialize the Client with API key
@@ -77,15 +82,66 @@ class AlchemyClient:
         except ValueError:
             raise AlchemyError("Invalid JSON response from API")
 
-    def get_wallet_balances(self, address, networks):
+    def iter_wallets_tokens(self, address_networks):
+        """
+        Stream token balances for several wallets across all result pages
+
+        Args:
+            address_networks: List of (address, networks) tuples
+
+        Yields:
+            Token balance dicts, one at a time
+        """
+        for tokens in self.iter_wallets_balance_pages(address_networks):
+            yield from tokens
+
+    def iter_wallets_balance_pages(self, address_networks):
+        """
+        Stream result pages for a balance request, following pageKey
+
+        The next page is requested in a background thread as soon as its
+        pageKey is known, so it downloads while the caller processes the
+        current page. At most two pages are held in memory.
+
+        Args:
+            address_networks: List of (address, networks) tuples
+
+        Yields:
+            List of token balance dicts for each page
         """
-        Get token balances for wallet across all supported chains
+        if len(address_networks) > self.MAX_ADDRESSES_PER_REQUEST:
+            raise AlchemyError(f"At most {self.MAX_ADDRESSES_PER_REQUEST} addresses per request")
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(self._get_balances_page, address_networks)
+            seen_page_keys = set()
+
+            while future is not None:
+                data = future.result()
+                page_key = data.get("pageKey")
+
+                # Prefetch the next page before handing this one to the caller
+                if page_key and page_key not in seen_page_keys:
+                    seen_page_keys.add(page_key)
+                    future = executor.submit(self._get_balances_page, address_networks, page_key)
+                else:
+                    future = None
+
+                yield data.get("tokens") or []
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_balances_page(self, address_networks, page_key=None):
+        """
+        Get a single page of token balances
+
         Args:
-            address: Wallet address
-            networks: List of network names
+            address_networks: List of (address, networks) tuples
+            page_key: Cursor returned by the previous page
 
         Return:
-            Dictionary with wallet balance data
+            Dictionary with 'tokens' and, if more results exist, 'pageKey'
         """
         endpoint = "/assets/tokens/by-address"
         
@@ -95,8 +151,12 @@ class AlchemyClient:
                         "address": address,
                         "networks": networks
                         }
+                    for address, networks in address_networks
                     ]
                 }
 
+        if page_key:
+            request_data["pageKey"] = page_key
+
         response_data = self._make_request(endpoint, request_data)
         return response_data.get("data", {})
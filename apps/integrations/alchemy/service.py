@@ -1,31 +1,54 @@
-from apps.tokens.models import SolanaTokenDecimals
+from apps.tokens.services.service import SolanaDecimalsIndex
 from .serializers import AlchemyTokenBalanceSerializer
 from config.chain_mapping import ALCHEMY_NETWORK_MAPPING
 
 
-class AlchemyWalletService:
-    def process_wallet_balances(self, wallet_response):
-        """Process and filter wallet balance data"""
-        tokens = wallet_response.get('tokens')
-        valid_tokens = []
+def wallet_key(address, network):
+    """
+    Key used to match tokens in a batched response back to a wallet
 
-        for token_data in tokens:
+    EVM addresses are hex and may come back in a different case; other
+    addresses (e.g. Solana base58) are case-sensitive.
+    """
+    if address.startswith('0x'):
+        address = address.lower()
+    return (address, network)
 
-            # Validate basic structure
-            serializer = AlchemyTokenBalanceSerializer(data=token_data)
-            if not serializer.is_valid():
-                continue
 
-            # Filter out the potential scam coins
-            if not self._should_include_token(token_data, serializer):
-                continue
+class AlchemyWalletService:
+    def iter_valid_tokens(self, tokens):
+        """
+        Filter and convert tokens one at a time
 
-            # Conver and enrich data
-            processed_token = self._convert_token_data(token_data)
+        Args:
+            tokens: Iterable of Alchemy token balance dicts (may be a stream)
+
+        Yields:
+            Processed token dicts
+        """
+        for token_data in tokens:
+            processed_token = self.process_token(token_data)
             if processed_token:
-                valid_tokens.append(processed_token)
+                yield processed_token
+
+    def process_token(self, token_data):
+        """
+        Validate, filter and convert a single token
+
+        Returns:
+            dict: Processed token data, or None if the token is skipped
+        """
+        # Validate basic structure
+        serializer = AlchemyTokenBalanceSerializer(data=token_data)
+        if not serializer.is_valid():
+            return None
+
+        # Filter out the potential scam coins
+        if not self._should_include_token(token_data, serializer):
+            return None
 
-        return valid_tokens
+        # Conver and enrich data
+        return self._convert_token_data(token_data)
 
     def _should_include_token(self, token_data, serializer):
         """Logic for filtering tokens"""
@@ -34,7 +57,7 @@ class AlchemyWalletService:
             return False
 
         if token_data['network'] == 'solana-mainnet' and token_data['tokenAddress']:
-            return SolanaTokenDecimals.objects.filter(token__contract_address=token_data['tokenAddress']).exists()
+            return token_data['tokenAddress'] in SolanaDecimalsIndex.get_decimals()
 
         return True
 
@@ -47,9 +70,8 @@ class AlchemyWalletService:
             if not network_info:
                 return None
             
-            # Calculate balance
-            decimal_balance = self._hex_to_decimal_balance(
-                    token_data['tokenBalance'],
+            # Keep the exact on-chain integer, scaled by the token's decimals
+            decimals = self._token_decimals(
                     token_data['tokenMetadata'],
                     token_data['network'],
                     token_data['tokenAddress']
@@ -59,7 +81,8 @@ class AlchemyWalletService:
                 'wallet_address': token_data['address'],
                 'coingecko_chain': network_info['coingecko_name'],
                 'contract_address': token_data['tokenAddress'],
-                'decimal_balance': decimal_balance,
+                'raw_balance': int(token_data['tokenBalance'], 16),
+                'decimals': decimals,
                 'name': token_data['tokenMetadata'].get('name'),
             }
         
@@ -67,19 +90,15 @@ class AlchemyWalletService:
             print(f"Error converting token data: {e}")
             return None
 
-    def _hex_to_decimal_balance(self, hex_balance, metadata, network, token_address):
-        """Convert hex balance to human readable decimal"""
-        raw_balance = int(hex_balance, 16)
-        
+    def _token_decimals(self, metadata, network, token_address):
+        """Get the number of decimals of a token's raw balance"""
         # Native token
         if token_address is None:
             network_info = ALCHEMY_NETWORK_MAPPING.get(network)
             decimals = network_info['native_decimals'] # type: ignore
         elif network == "solana-mainnet" and token_address:
-            solana_decimal = SolanaTokenDecimals.objects.select_related('token').get(token__contract_address=token_address)
-            decimals = solana_decimal.decimals
+            decimals = SolanaDecimalsIndex.get_decimals()[token_address]
         else:
             decimals = metadata.get('decimals')
 
-        return raw_balance / (10 ** decimals)
-
+        return int(decimals)
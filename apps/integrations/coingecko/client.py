@@ -1,11 +1,32 @@
+import threading
 import requests
 from django.conf import settings
+from apps.integrations.rate_limit import TokenBucket
 from .exceptions import (
         CoinGeckoError,
         CoinGeckoApiError,
         CoinGeckoRateLimitError,
         CoinGeckoConnectionError
         )
+from .streaming import STREAM_CHUNK_SIZE, iter_json_array, iter_batches
+
+# Process-wide limiter shared by every client instance and thread
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide CoinGecko token bucket, sized from settings"""
+    global _rate_limiter
+
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket.per_minute(
+                getattr(settings, "COINGECKO_RATE_LIMIT_PER_MINUTE", 30),
+                capacity=getattr(settings, "COINGECKO_MAX_CONCURRENT_REQUESTS", 2),
+            )
+        return _rate_limiter
+
 
 class CoinGeckoClient:
     """Client for interacting with Coingecko API"""
@@ -20,21 +41,23 @@ class CoinGeckoClient:
             api_key: Coingecko API key (defaults to settings)
         """
         self.api_key = api_key or getattr(settings, "COINGECKO_API_KEY", None)
+        self.rate_limiter = get_rate_limiter()
 
         # Validate API key exists
         if not self.api_key:
             raise CoinGeckoError("Coingecko API key is rerquired")
 
-    def _make_request(self, endpoint, params=None):
+    def _send_request(self, endpoint, params=None, stream=False):
         """
-        Make HTTP request to CoinGecko API
+        Send HTTP request to CoinGecko API and check the response status
 
         Args:
             endpoint: API endpoint (without base URL)
             params: Query parameters
+            stream: Whether to defer downloading the response body
 
         Returns:
-            JSON response data
+            requests.Response
 
         Raises:
             Various CoinGeckoError subclasses
@@ -46,8 +69,10 @@ class CoinGeckoClient:
                 "x-cg-demo-api-key": self.api_key
                 }
 
+        self.rate_limiter.acquire()
+
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = requests.get(url, headers=headers, params=params, timeout=30, stream=stream)
         except requests.exceptions.ConnectionError:
             raise CoinGeckoConnectionError("Failed to connect to Coingecko API")
         except requests.exceptions.Timeout:
@@ -55,31 +80,82 @@ class CoinGeckoClient:
 
         # Handle rate limiting
         if response.status_code == 429:
-            raise CoinGeckoRateLimitError("Rate limit exceeded")
+            response.close()
+            retry_after = response.headers.get("Retry-After")
+            raise CoinGeckoRateLimitError(
+                "Rate limit exceeded",
+                retry_after=int(retry_after) if retry_after and retry_after.isdigit() else None
+            )
 
         # Handle other errors
         if response.status_code != 200:
             try:
                 error_data = response.json()
                 error_msg = error_data.get('error', f'HTTP {response.status_code}')
-                raise CoinGeckoApiError(f"API error: {error_msg}")
+                raise CoinGeckoApiError(f"API error: {error_msg}", status_code=response.status_code)
             except ValueError:
-                raise CoinGeckoApiError(f"HTTP error: {response.status_code}")
+                raise CoinGeckoApiError(f"HTTP error: {response.status_code}", status_code=response.status_code)
+            finally:
+                response.close()
+
+        return response
+
+    def _make_request(self, endpoint, params=None):
+        """
+        Make HTTP request to CoinGecko API
+
+        Args:
+            endpoint: API endpoint (without base URL)
+            params: Query parameters
+
+        Returns:
+            JSON response data
+
+        Raises:
+            Various CoinGeckoError subclasses
+        """
+        response = self._send_request(endpoint, params)
 
         try:
             return response.json()
         except ValueError:
             raise CoinGeckoError("Invalid JSON response from API")
 
-    def get_coins_list(self, include_platform=True):
+    def _stream_request(self, endpoint, params=None):
         """
-        Get list of all CoinGecko coins with IDs, symbols, names
+        Make HTTP request to CoinGecko API and stream a JSON array response
+
+        Args:
+            endpoint: API endpoint (without base URL)
+            params: Query parameters
+
+        Yields:
+            Array elements as they are parsed off the socket
+
+        Raises:
+            Various CoinGeckoError subclasses
+        """
+        response = self._send_request(endpoint, params, stream=True)
+
+        try:
+            yield from iter_json_array(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+        except ValueError:
+            raise CoinGeckoError("Invalid JSON response from API")
+        except requests.exceptions.RequestException:
+            raise CoinGeckoConnectionError("Coingecko API stream interrupted")
+        finally:
+            response.close()
+
+    def iter_coins_list(self, include_platform=True, batch_size=None):
+        """
+        Stream the list of all CoinGecko coins without loading it into memory
 
         Args:
             include_platform: Whether to include platform contract addresses for every token
+            batch_size: If set, yield lists of up to batch_size coins instead of single coins
 
-        Returns:
-            List of coin data
+        Yields:
+            Coin data dicts, or lists of them when batch_size is set
         """
         endpoint = "/coins/list"
         params = {}
@@ -87,13 +163,22 @@ class CoinGeckoClient:
         if include_platform:
             params["include_platform"] = "true"
 
-        return self._make_request(endpoint, params)
+        coins = self._stream_request(endpoint, params)
+
+        if batch_size:
+            return iter_batches(coins, batch_size)
+        return coins
     
     def get_coins_markets_single_page(self, page=1, vs_currency='usd', per_page=250, order='market_cap_desc', precision='full'):
         """
         Get market data for a single page to minimize memory usage
         
-        Returns: Single page of coin market data or empty list if no more data
+        Returns: Single page of coin market data, an empty list only past the last page
+
+        Raises:
+            CoinGeckoRateLimitError, CoinGeckoConnectionError: Transient errors the caller should retry
+            CoinGeckoApiError, CoinGeckoError: Error status or unexpected response; never
+                reported as an empty page, so a failed page can't pass for the end of the list
         """
         endpoint = "/coins/markets"
         params = {
@@ -106,8 +191,30 @@ class CoinGeckoClient:
             'precision': precision
         }
         
-        try:
-            return self._make_request(endpoint, params)
-        except Exception as e:
-            print(f"Error fetching page {page}: {e}")
-            return []
+        page_data = self._make_request(endpoint, params)
+        if not isinstance(page_data, list):
+            raise CoinGeckoError(f"Unexpected response for page {page}")
+
+        return page_data
+
+    def get_simple_prices(self, ids, vs_currency='usd', precision='full'):
+        """
+        Get current prices and 24h change for a batch of coins
+
+        Args:
+            ids: List of CoinGecko coin ids
+            vs_currency: Target currency
+            precision: Decimal places for price values
+
+        Returns:
+            Dictionary of coin id -> price data
+        """
+        endpoint = "/simple/price"
+        params = {
+            'ids': ','.join(ids),
+            'vs_currencies': vs_currency,
+            'include_24hr_change': 'true',
+            'precision': precision
+        }
+
+        return self._make_request(endpoint, params)
@@ -3,12 +3,18 @@ class CoinGeckoError(Exception):
     pass
 
 class CoinGeckoApiError(CoinGeckoError):
-    """Raised when API key is invalid or missing"""
-    pass
+    """Raised when the API answers with an error status (e.g. invalid or missing API key)"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
 
 class CoinGeckoRateLimitError(CoinGeckoError):
     """Raised when rate limit is exceeded"""
-    pass
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 class CoinGeckoConnectionError(CoinGeckoError):
     """Raised when unable to connect to API"""
@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .exceptions import CoinGeckoApiError, CoinGeckoRateLimitError, CoinGeckoConnectionError
+
+
+class MarketPageFetcher:
+    """
+    Fetch /coins/markets pages concurrently, in page order
+
+    Keeps up to `max_in_flight` page requests running in background threads
+    while the caller processes the current page, so fetching page N+1
+    overlaps writing page N. Request pacing is left to the client's shared
+    token bucket, so throughput is bounded by the API quota.
+    """
+
+    def __init__(self, client, per_page=250, max_in_flight=None, max_retries=5, backoff_seconds=5):
+        """
+        Initialize the fetcher
+
+        Args:
+            client: CoinGeckoClient instance
+            per_page: Coins per page (a shorter page marks the last one)
+            max_in_flight: Concurrent page requests (defaults to settings)
+            max_retries: Attempts per page on rate limit / connection / server errors
+            backoff_seconds: Base delay for exponential backoff
+        """
+        self.client = client
+        self.per_page = per_page
+        self.max_in_flight = max_in_flight or getattr(settings, "COINGECKO_MAX_CONCURRENT_REQUESTS", 2)
+        self.max_retries = max(max_retries, 1)
+        self.backoff_seconds = backoff_seconds
+
+    def _fetch_page(self, page):
+        """
+        Fetch one page, backing off on rate limit, connection and 5xx errors
+
+        Any other error, or a transient one that outlives the retries, is
+        raised: only an empty 200 response ends the list.
+        """
+        for attempt in range(self.max_retries):
+            try:
+                return self.client.get_coins_markets_single_page(page=page, per_page=self.per_page)
+
+            except CoinGeckoRateLimitError as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                delay = e.retry_after or self.backoff_seconds * (2 ** attempt)
+                print(f"Rate limited on page {page}, backing off {delay}s")
+                # Hold back every thread sharing the bucket, not just this one
+                self.client.rate_limiter.pause(delay)
+
+            except (CoinGeckoConnectionError, CoinGeckoApiError) as e:
+                server_error = isinstance(e, CoinGeckoConnectionError) or (e.status_code or 0) >= 500
+                if not server_error or attempt == self.max_retries - 1:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt)
+                print(f"Error on page {page}: {e}, retrying in {delay}s")
+                time.sleep(delay)
+
+    def iter_pages(self):
+        """
+        Yield (page_number, page_data) in order until the last page
+
+        Raises:
+            CoinGeckoError: If a page fails (after retries for transient errors)
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        futures = {}
+        next_page = 1
+        current_page = 1
+
+        try:
+            while True:
+                # Keep the pipeline full
+                while len(futures) < self.max_in_flight:
+                    futures[next_page] = executor.submit(self._fetch_page, next_page)
+                    next_page += 1
+
+                page_data = futures.pop(current_page).result()
+
+                if not page_data:
+                    return
+
+                yield current_page, page_data
+
+                if len(page_data) < self.per_page:
+                    return
+
+                current_page += 1
+        finally:
+            # Drop requests queued past the last page
+            executor.shutdown(wait=True, cancel_futures=True)
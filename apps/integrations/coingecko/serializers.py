@@ -1,5 +1,11 @@
+import math
+from decimal import Decimal
 from rest_framework import serializers
 
+# Same scale and bound as CoingeckoPrice.percentage_24h (DecimalField(10, 5))
+PERCENTAGE_QUANTUM = Decimal('0.00001')
+MAX_PERCENTAGE = Decimal('99999.99999')
+
 class CoinGeckoCoinsListSerializer(serializers.Serializer):
     """
     Serializer for individual coin from CoinGecko coins/list API
@@ -13,10 +19,26 @@ class CoinGeckoMarketDataSerializer(serializers.Serializer):
     Serializer for individual coin from CoinGecko coins/markets API
     """
 
-    id = serializers.CharField()
-    symbol = serializers.CharField(allow_blank=False)
-    name = serializers.CharField()
-    image = serializers.URLField(allow_null=True, required=False)
+    # Lengths match TokenMaster, so an oversized coin is rejected on its own
+    # instead of failing the bulk upsert of its whole page
+    id = serializers.CharField(max_length=100)
+    symbol = serializers.CharField(allow_blank=False, max_length=50)
+    name = serializers.CharField(max_length=250)
+    image = serializers.URLField(allow_null=True, required=False, max_length=512)
     current_price = serializers.DecimalField(max_digits=70, decimal_places=50, required=True)
     market_cap_rank = serializers.IntegerField(allow_null=True)
     price_change_percentage_24h = serializers.DecimalField(max_digits=10, decimal_places=5, required=False)
+
+class CoinGeckoSimplePriceSerializer(serializers.Serializer):
+    """
+    Serializer for individual coin price from CoinGecko simple/price API
+    """
+
+    usd = serializers.DecimalField(max_digits=70, decimal_places=50)
+    usd_24h_change = serializers.FloatField(allow_null=True, required=False)
+
+    def validate_usd_24h_change(self, value):
+        """Quantize to the stored scale; changes the column cannot hold are stored as null"""
+        if value is None or not math.isfinite(value) or abs(value) > MAX_PERCENTAGE:
+            return None
+        return Decimal(str(value)).quantize(PERCENTAGE_QUANTUM)
@@ -1,24 +1,65 @@
+import hashlib
+from collections import Counter
 from django.db import transaction
 from django.utils import timezone
 from apps.tokens.models import Token, TokenMaster
 from apps.prices.models import CoingeckoPrice
+from apps.portfolio.fixed_point import price_to_fixed
+from apps.portfolio.models import WalletTokenBalance
+from apps.portfolio.services.valuation import ValuationService
+from apps.prices.services.service import HeldTokenService, PriceSnapshot
 from .client import CoinGeckoClient
-from .serializers import CoinGeckoCoinsListSerializer, CoinGeckoMarketDataSerializer
+from .fetcher import MarketPageFetcher
+from .serializers import CoinGeckoCoinsListSerializer, CoinGeckoMarketDataSerializer, CoinGeckoSimplePriceSerializer
+from .streaming import iter_batches
 from config.chain_mapping import COINGECKO_NATIVE_TOKEN_MAPPING
-from django.utils import timezone
-import time
-import gc
+
+# Rows per INSERT ... ON CONFLICT statement
+BULK_BATCH_SIZE = 500
+
+# Coin ids per /simple/price request (keeps the query string well under URL limits)
+SIMPLE_PRICE_BATCH_SIZE = 200
+
+def _fingerprint(*values):
+    """Compact 64-bit hash of field values, stored to detect unchanged rows"""
+    digest = hashlib.blake2b(repr(values).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
 
 class CoinGeckoSyncService:
     def __init__(self):
         self.client = CoinGeckoClient()
+        self.write_counts = Counter()
+        self.seen_coingecko_ids = set()
+        self.changed_price_master_ids = set()
+        self.repointed_token_ids = set()
+
+        # Set once a market sync walked every page up to the real end of the list
+        self.market_sync_complete = False
 
     def sync_market_data(self):
         """Market data sync"""
         
         try:
-            success_count, error_count = self._process_market_data_chunked()
-            return f"Synced {success_count} tokens, {error_count} errors"
+            self.write_counts.clear()
+            self.seen_coingecko_ids.clear()
+            self.changed_price_master_ids.clear()
+            self.market_sync_complete = False
+
+            try:
+                success_count, error_count = self._process_market_data_chunked()
+                self.market_sync_complete = True
+            finally:
+                # Revalue holdings once for every price committed during the sync, even
+                # when a later page failed; their fingerprints hide them from the next run
+                revalued_count = self._apply_price_changes()
+
+            return (
+                f"Synced {success_count} tokens "
+                f"({self.write_counts['inserted']} inserted, {self.write_counts['updated']} updated, "
+                f"{self.write_counts['unchanged']} unchanged), {error_count} errors, "
+                f"{revalued_count} wallets revalued"
+            )
 
         except Exception as e:
             print(f"sync_market_data failed: {e}")
@@ -28,104 +69,276 @@ class CoinGeckoSyncService:
         """Chunked market data processing"""
         total_success = 0
         total_errors = 0
-        page = 1
-        
-        while True:
-            page_data = self.client.get_coins_markets_single_page(page=page)
-            
-            if not page_data:
-                break
-            
-            # Process page
+
+        # Pages are prefetched concurrently while the current one is written
+        fetcher = MarketPageFetcher(self.client)
+
+        for page, page_data in fetcher.iter_pages():
             success_count, error_count = self._process_market_data_page(page_data)
             total_success += success_count
             total_errors += error_count
-            
-            # Check if last page
-            is_last_page = len(page_data) < 250
-            
-            # Delete page data
-            del page_data
-            
-            # Garbage collect every 5 pages
-            if page % 5 == 0:
-                gc.collect()
-            
-            if is_last_page:
-                break
-                
-            page += 1
-            time.sleep(2.5)
         
         return total_success, total_errors
 
     def _process_market_data_page(self, page_data):
-        """Process page"""
+        """Process page with set-based upserts"""
         success_count = 0
         error_count = 0
-        
+
+        # Validate the whole page first, keyed by coingecko_id (last occurrence wins)
+        valid_coins = {}
         for coin_data in page_data:
             try:
                 serializer = CoinGeckoMarketDataSerializer(data=coin_data)
-                
+
                 if serializer.is_valid():
                     validated_data = serializer.validated_data
-                    
-                    # Capture the token_master from update_or_create
-                    token_master, created = TokenMaster.objects.update_or_create(
-                        coingecko_id=validated_data['id'], # type: ignore
-                        defaults={
-                            'symbol': validated_data['symbol'], # type: ignore
-                            'name': validated_data['name'], # type: ignore
-                            'image': validated_data['image'], # type: ignore
-                            'coingecko_rank': validated_data['market_cap_rank'], # type: ignore
-                            'coingecko_updated_at': timezone.now(),
-                        }
-                    )
-                    
-                    CoingeckoPrice.objects.update_or_create(
-                        token_master=token_master,
-                        defaults={
-                            'price_usd': validated_data['current_price'], # type: ignore
-                            'percentage_24h': validated_data['price_change_percentage_24h'], # type: ignore
-                        }
-                    )
-                    
+                    valid_coins[validated_data['id']] = validated_data # type: ignore
                     success_count += 1
-                    
                 else:
                     error_count += 1
-                    
+
             except Exception as e:
                 print(f"Failed to serialize coin data: {e}")
                 error_count += 1
-            
+
+        if not valid_coins:
+            return success_count, error_count
+
+        try:
+            self.write_counts.update(self._bulk_upsert_market_data(valid_coins))
+            self.seen_coingecko_ids.update(valid_coins.keys())
+        except Exception as e:
+            print(f"Failed to write market data page: {e}")
+            error_count += success_count
+            success_count = 0
+
         return success_count, error_count
 
+    @transaction.atomic
+    def _bulk_upsert_market_data(self, valid_coins):
+        """
+        Write changed TokenMaster and CoingeckoPrice rows for a page of coins
+
+        Each coin's master and price fields are fingerprinted and compared with
+        the stored fingerprints; only new or changed rows are written, using
+        INSERT ... ON CONFLICT DO UPDATE.
+
+        Args:
+            valid_coins: Dict of coingecko_id -> validated market data
+
+        Returns:
+            dict: Counts of 'inserted', 'updated' and 'unchanged' coins
+        """
+        now = timezone.now()
+
+        existing = {
+            coingecko_id: (master_id, master_fingerprint, price_fingerprint)
+            for coingecko_id, master_id, master_fingerprint, price_fingerprint in TokenMaster.objects.filter(
+                coingecko_id__in=valid_coins.keys()
+            ).values_list('coingecko_id', 'id', 'coingecko_fingerprint', 'coingecko_price__fingerprint')
+        }
+
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        changed_masters = []
+        changed_prices = {}
+
+        for coingecko_id, data in valid_coins.items():
+            master_fingerprint = _fingerprint(
+                data['symbol'], data['name'], data.get('image'), data['market_cap_rank']
+            )
+            price_fingerprint = _fingerprint(
+                data['current_price'], data.get('price_change_percentage_24h')
+            )
+            _, stored_master_fingerprint, stored_price_fingerprint = existing.get(coingecko_id, (None, None, None))
+
+            master_changed = stored_master_fingerprint != master_fingerprint
+            price_changed = stored_price_fingerprint != price_fingerprint
+
+            if coingecko_id not in existing:
+                counts['inserted'] += 1
+            elif master_changed or price_changed:
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+                continue
+
+            if master_changed:
+                changed_masters.append(TokenMaster(
+                    coingecko_id=coingecko_id,
+                    symbol=data['symbol'],
+                    name=data['name'],
+                    image=data.get('image'),
+                    coingecko_rank=data['market_cap_rank'],
+                    coingecko_updated_at=now,
+                    coingecko_fingerprint=master_fingerprint,
+                ))
+            if price_changed:
+                changed_prices[coingecko_id] = (data, price_fingerprint)
+
+        if changed_masters:
+            TokenMaster.objects.bulk_create(
+                changed_masters,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['coingecko_id'],
+                update_fields=['symbol', 'name', 'image', 'coingecko_rank', 'coingecko_updated_at', 'coingecko_fingerprint'],
+            )
+
+        if changed_prices:
+            master_ids = {coingecko_id: row[0] for coingecko_id, row in existing.items()}
+
+            # Resolve primary keys of new masters (not every backend returns them on conflict)
+            new_ids = [coingecko_id for coingecko_id in changed_prices if coingecko_id not in master_ids]
+            if new_ids:
+                master_ids.update(
+                    TokenMaster.objects.filter(coingecko_id__in=new_ids).values_list('coingecko_id', 'id')
+                )
+
+            prices = []
+            for coingecko_id, (data, price_fingerprint) in changed_prices.items():
+                if coingecko_id not in master_ids:
+                    continue
+
+                price_mantissa, price_exponent = price_to_fixed(data['current_price'])
+                prices.append(CoingeckoPrice(
+                    token_master_id=master_ids[coingecko_id],
+                    price_mantissa=price_mantissa,
+                    price_exponent=price_exponent,
+                    percentage_24h=data.get('price_change_percentage_24h'),
+                    fingerprint=price_fingerprint,
+                ))
+
+            CoingeckoPrice.objects.bulk_create(
+                prices,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['token_master'],
+                update_fields=['price_mantissa', 'price_exponent', 'percentage_24h', 'updated_at', 'fingerprint'],
+            )
+            self.changed_price_master_ids.update(price.token_master_id for price in prices)
+
+        return counts
+
+    def sync_held_token_prices(self):
+        """
+        Refresh prices only for tokens held in at least one wallet
+
+        Uses batched /simple/price calls and only updates existing
+        CoingeckoPrice rows whose price actually changed.
+        """
+        try:
+            held_ids = sorted(HeldTokenService().get_held_coingecko_ids())
+            self.changed_price_master_ids.clear()
+
+            updated_count = 0
+            error_count = 0
+
+            try:
+                for batch in iter_batches(held_ids, SIMPLE_PRICE_BATCH_SIZE):
+                    price_data = self.client.get_simple_prices(batch)
+                    batch_updated, batch_errors = self._update_held_prices(price_data)
+                    updated_count += batch_updated
+                    error_count += batch_errors
+            finally:
+                # Revalue holdings once for every price committed during the refresh, even
+                # when a later batch failed; their fingerprints hide them from the next run
+                revalued_count = self._apply_price_changes()
+
+            return (
+                f"Refreshed {len(held_ids)} held tokens, {updated_count} prices changed, "
+                f"{error_count} errors, {revalued_count} wallets revalued"
+            )
+
+        except Exception as e:
+            print(f"sync_held_token_prices failed: {e}")
+            raise
+
+    def _apply_price_changes(self):
+        """
+        Revalue holdings of tokens whose price changed and invalidate cached responses
+
+        Returns:
+            int: Number of wallets revalued
+        """
+        if not self.changed_price_master_ids:
+            return 0
+
+        revalued_count = ValuationService().refresh_prices(self.changed_price_master_ids)
+        PriceSnapshot.publish()
+        return revalued_count
+
+    def _update_held_prices(self, price_data):
+        """
+        Apply a /simple/price response to existing CoingeckoPrice rows
+
+        Args:
+            price_data: Dict of coingecko_id -> {'usd': ..., 'usd_24h_change': ...}
+
+        Returns:
+            tuple: (updated_count, error_count)
+        """
+        error_count = 0
+        valid_prices = {}
+
+        for coingecko_id, coin_price in price_data.items():
+            serializer = CoinGeckoSimplePriceSerializer(data=coin_price)
+            if not serializer.is_valid():
+                error_count += 1
+                continue
+
+            price_usd = serializer.validated_data['usd'] # type: ignore
+            percentage_24h = serializer.validated_data.get('usd_24h_change') # type: ignore
+            valid_prices[coingecko_id] = (price_usd, percentage_24h)
+
+        now = timezone.now()
+        changed_prices = []
+
+        for price in CoingeckoPrice.objects.filter(
+            token_master__coingecko_id__in=valid_prices.keys()
+        ).select_related('token_master').only('id', 'fingerprint', 'token_master__coingecko_id'):
+            price_usd, percentage_24h = valid_prices[price.token_master.coingecko_id]
+            fingerprint = _fingerprint(price_usd, percentage_24h)
+
+            if price.fingerprint == fingerprint:
+                continue
+
+            price.price_mantissa, price.price_exponent = price_to_fixed(price_usd)
+            price.percentage_24h = percentage_24h
+            price.fingerprint = fingerprint
+            price.updated_at = now
+            changed_prices.append(price)
+
+        if changed_prices:
+            CoingeckoPrice.objects.bulk_update(
+                changed_prices,
+                ['price_mantissa', 'price_exponent', 'percentage_24h', 'fingerprint', 'updated_at'],
+                batch_size=BULK_BATCH_SIZE,
+            )
+            self.changed_price_master_ids.update(price.token_master_id for price in changed_prices)
+
+        return len(changed_prices), error_count
+
     def sync_multi_chain_tokens(self):
         """Memory-efficient multi-chain sync"""
         print("Starting CoinGecko token multi-chain sync...")
         try:
-            coins_list = self.client.get_coins_list(include_platform=True)
-
             total_success = 0
             total_errors = 0
-            chunk_size = 100  # Process 100 tokens at a time
-
-            # Process in chunks
-            for i in range(0, len(coins_list), chunk_size):
-                chunk = coins_list[i:i + chunk_size]
-                success_count, error_count = self._process_multi_chain_tokens_chunk(chunk)
-                
-                total_success += success_count
-                total_errors += error_count
-                
-                # Clean up chunk
-                del chunk
-                
-                # Garbage collect every 5 chunks
-                if (i // chunk_size + 1) % 5 == 0:
-                    gc.collect()
+            chunk_size = 1000  # Process 1000 tokens at a time
+            self.repointed_token_ids.clear()
+
+            try:
+                # Coins are parsed off the socket and processed chunk by chunk,
+                # so the full list is never held in memory
+                for chunk in self.client.iter_coins_list(include_platform=True, batch_size=chunk_size):
+                    success_count, error_count = self._process_multi_chain_tokens_chunk(chunk)
+
+                    total_success += success_count
+                    total_errors += error_count
+            finally:
+                # Revalue holdings of tokens committed with a different master
+                self._apply_repointed_tokens()
 
             print(f"Multi-chain sync completed: {total_success} successful, {total_errors} errors")
             return f"Created {total_success} token implementations, {total_errors} errors"
@@ -142,10 +355,13 @@ class CoinGeckoSyncService:
         # Batch lookup TokenMasters for this chunk
         coingecko_ids = [coin['id'] for coin in chunk if 'id' in coin]
         token_masters = {
-            tm.coingecko_id: tm 
-            for tm in TokenMaster.objects.filter(coingecko_id__in=coingecko_ids)
+            tm.coingecko_id: tm.pk
+            for tm in TokenMaster.objects.filter(coingecko_id__in=coingecko_ids).only('id', 'coingecko_id')
         }
-        
+
+        # Collect (chain, contract_address) -> master_id for the whole chunk
+        token_rows = {}
+
         for coin_data in chunk:
             try:
                 serializer = CoinGeckoCoinsListSerializer(data=coin_data)
@@ -153,8 +369,8 @@ class CoinGeckoSyncService:
                     validated_data = serializer.validated_data
                     coingecko_id = validated_data['id'] # type: ignore
 
-                    token_master = token_masters.get(coingecko_id)
-                    if not token_master:
+                    master_id = token_masters.get(coingecko_id)
+                    if not master_id:
                         error_count += 1
                         continue
 
@@ -168,28 +384,14 @@ class CoinGeckoSyncService:
                         
                         for chain, contract_address in platforms.items():
                             if contract_address:
-                                Token.objects.update_or_create(
-                                    chain=chain,
-                                    contract_address=contract_address,
-                                    defaults={
-                                        'master': token_master,
-                                        'coingecko_updated_at': timezone.now(),
-                                    }
-                                )
+                                token_rows[(chain, contract_address)] = master_id
                                 success_count += 1
                     else:
                         # Handle native tokens
                         if coingecko_id in COINGECKO_NATIVE_TOKEN_MAPPING:
                             chains = COINGECKO_NATIVE_TOKEN_MAPPING[coingecko_id]
                             for chain in chains:
-                                Token.objects.update_or_create(
-                                    chain=chain,
-                                    contract_address='native',
-                                    defaults={
-                                        'master': token_master,
-                                        'coingecko_updated_at': timezone.now(),
-                                    }
-                                )
+                                token_rows[(chain, 'native')] = master_id
                                 success_count += 1
                 else:
                     error_count += 1
@@ -197,13 +399,113 @@ class CoinGeckoSyncService:
             except Exception as e:
                 print(f"Error processing {coin_data.get('id', 'unknown')}: {e}")
                 error_count += 1
+
+        if token_rows:
+            self._bulk_upsert_tokens(token_rows)
     
         return success_count, error_count
 
+    def _bulk_upsert_tokens(self, token_rows):
+        """
+        Upsert Token implementations on the (chain, contract_address) key
+
+        Rows that already point at the same TokenMaster are skipped. Ids of
+        existing tokens moved to another master are collected in
+        repointed_token_ids, since their holdings now use another price.
+
+        Args:
+            token_rows: Dict of (chain, contract_address) -> master_id
+
+        Returns:
+            int: Number of rows written
+        """
+        contract_addresses = {contract_address for _, contract_address in token_rows}
+        existing = {
+            (chain, contract_address): (master_id, token_id)
+            for chain, contract_address, master_id, token_id in Token.objects.filter(
+                contract_address__in=contract_addresses
+            ).values_list('chain', 'contract_address', 'master_id', 'id')
+        }
+
+        now = timezone.now()
+        changed_tokens = [
+            Token(
+                chain=chain,
+                contract_address=contract_address,
+                master_id=master_id,
+                coingecko_updated_at=now,
+            )
+            for (chain, contract_address), master_id in token_rows.items()
+            if existing.get((chain, contract_address), (None, None))[0] != master_id
+        ]
+
+        if changed_tokens:
+            Token.objects.bulk_create(
+                changed_tokens,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['chain', 'contract_address'],
+                update_fields=['master', 'coingecko_updated_at'],
+            )
+
+            self.repointed_token_ids.update(
+                existing[(token.chain, token.contract_address)][1]
+                for token in changed_tokens
+                if (token.chain, token.contract_address) in existing
+            )
+
+        return len(changed_tokens)
+
+    def _apply_repointed_tokens(self):
+        """
+        Revalue holdings of tokens moved to another TokenMaster and invalidate cached responses
+
+        Returns:
+            int: Number of wallets revalued
+        """
+        if not self.repointed_token_ids:
+            return 0
+
+        holdings = set(
+            WalletTokenBalance.objects.filter(
+                token_id__in=self.repointed_token_ids
+            ).values_list('wallet_id', 'token_id')
+        )
+        if not holdings:
+            return 0
+
+        affected_wallet_ids = {wallet_id for wallet_id, _ in holdings}
+        ValuationService().refresh_wallets(affected_wallet_ids)
+        PriceSnapshot.publish()
+
+        # The new masters of held tokens may not be in the held set yet
+        HeldTokenService().add_held_tokens({token_id for _, token_id in holdings})
+
+        return len(affected_wallet_ids)
+
     def _remove_stale_tokens(self, sync_start_time):
+        """
+        Delete TokenMasters that were not returned by the last market sync
+
+        Unchanged coins are not rewritten, so coingecko_updated_at alone no
+        longer marks a coin as seen; the ids collected during the sync do.
+        """
+        if not self.market_sync_complete or not self.seen_coingecko_ids:
+            # The sync stopped before the end of the list (or synced nothing):
+            # coins past that point were not seen but are not stale
+            return 0, {}
+
         stale_tokens = TokenMaster.objects.filter(
             coingecko_id__isnull=False,
             coingecko_updated_at__lt=sync_start_time
-        )
-        return stale_tokens.delete()
+        ).exclude(coingecko_id__in=self.seen_coingecko_ids)
 
+        # Balances of deleted tokens cascade away, revalue the wallets that held them
+        affected_wallet_ids = set(
+            WalletTokenBalance.objects.filter(token__master__in=stale_tokens).values_list('wallet_id', flat=True)
+        )
+        deleted = stale_tokens.delete()
+        if affected_wallet_ids:
+            ValuationService().refresh_wallets(affected_wallet_ids)
+            PriceSnapshot.publish()
+        return deleted
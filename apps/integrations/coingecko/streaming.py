@@ -0,0 +1,123 @@
+import codecs
+import json
+
+# Bytes read from the socket per iteration
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+
+def iter_json_array(byte_chunks):
+    """
+    Incrementally parse a top-level JSON array from an iterable of byte chunks
+
+    Only the element currently being parsed (plus one network chunk) is kept
+    in memory, so peak memory does not grow with the size of the array.
+
+    Args:
+        byte_chunks: Iterable of bytes (e.g. response.iter_content())
+
+    Yields:
+        Decoded array elements, one at a time
+
+    Raises:
+        ValueError: If the payload is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(byte_chunks)
+
+    buffer = ''
+    pos = 0
+    eof = False
+
+    # What may come next: the opening bracket, the first element or "]",
+    # an element (after a comma), or a separator ("," or "]")
+    expect = 'open'
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        for chunk in chunks:
+            if chunk:
+                # Drop consumed text before appending to keep the buffer small
+                buffer = buffer[pos:] + utf8.decode(chunk)
+                pos = 0
+                return
+        buffer = buffer[pos:] + utf8.decode(b'', final=True)
+        pos = 0
+        eof = True
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            read_more()
+            continue
+
+        char = buffer[pos]
+
+        if expect == 'open':
+            if char != '[':
+                raise ValueError("Expected a JSON array")
+            expect = 'first'
+            pos += 1
+            continue
+
+        if expect == 'separator':
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError("Expected ',' or ']' after a JSON array element")
+            expect = 'element'
+            pos += 1
+            continue
+
+        if char == ']' and expect == 'first':
+            return
+        if char in ',]':
+            # "[,", "[1,,2]" or a trailing "[1,]"
+            raise ValueError("Expected a JSON array element")
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("Invalid JSON array element")
+            read_more()
+            continue
+
+        # A number cut at the buffer edge (e.g. "1.5e" of "1.5e3") may continue
+        # in the next chunk, so only accept values followed by a delimiter
+        if not eof and (end == len(buffer) or buffer[end] not in _DELIMITERS):
+            read_more()
+            continue
+
+        pos = end
+        expect = 'separator'
+        yield item
+
+
+def iter_batches(items, batch_size):
+    """
+    Group an iterable into lists of at most batch_size items
+
+    Args:
+        items: Any iterable
+        batch_size: Maximum number of items per batch
+
+    Yields:
+        Lists of items
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
@@ -31,3 +31,14 @@ def sync_multichain_tokens_task():
     except Exception as e:
         print(f"Multi-chain sync failed: {e}")
         raise
+
+@shared_task
+def sync_held_token_prices_task():
+    """Fast price refresh for tokens held in user wallets"""
+    try:
+        service = CoinGeckoSyncService()
+        result = service.sync_held_token_prices()
+        return f"Held token price sync: {result}"
+    except Exception as e:
+        print(f"Held token price sync failed: {e}")
+        raise
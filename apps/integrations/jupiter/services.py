@@ -1,5 +1,6 @@
 from django.db import transaction
 from apps.tokens.models import Token, SolanaTokenDecimals
+from apps.tokens.services.service import SolanaDecimalsIndex
 from .client import JupiterClient
 from .serializers import JupiterTaggedCoinsSerializer
 from django.utils import timezone
@@ -19,7 +20,10 @@ class JupiterSyncService:
             sync_start_time = timezone.now()
             success_count, error_count = self._process_jupiter_tokens(jupiter_data)
             self._remove_stale_tokens(sync_start_time)
-            print(f"Decimals sync completed: {success_count} successful, {error_count} errors")
+
+            # Publish a new version of the in-memory decimals index for workers
+            index_size = SolanaDecimalsIndex.rebuild()
+            print(f"Decimals sync completed: {success_count} successful, {error_count} errors, {index_size} mints indexed")
             return f"Synced {success_count} decimals, {error_count} errors"
 
         except Exception as e:
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from django.core.cache import cache
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    Each request consumes one token and blocks until one is available.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        Initialize the bucket
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, capacity=1):
+        """Create a bucket sized from a requests-per-minute quota"""
+        return cls(rate=requests_per_minute / 60.0, capacity=capacity)
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Stop handing out tokens for the given number of seconds
+
+        Used when the remote API reports a rate limit, so every thread
+        sharing the bucket backs off instead of just the one that hit it.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated_at = self._paused_until
+
+
+class CacheSemaphore:
+    """
+    Counting semaphore shared by every process through the cache
+
+    A holder claims one of `slots` numbered keys with cache.add. Claims
+    expire after `lease_seconds`, so slots held by a killed process come
+    back on their own.
+    """
+
+    def __init__(self, name, slots, lease_seconds=120, poll_seconds=0.2):
+        """
+        Initialize the semaphore
+
+        Args:
+            name: Cache key prefix, shared by every process using the semaphore
+            slots: Maximum number of concurrent holders
+            lease_seconds: Lifetime of a claim, longer than any holder should run
+            poll_seconds: Wait between attempts while every slot is taken
+        """
+        self.name = name
+        self.slots = max(1, slots)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+
+    def acquire(self):
+        """
+        Block until a slot is free, then claim it
+
+        Returns:
+            tuple: (slot key, claim token) to pass to release()
+        """
+        token = uuid.uuid4().hex
+        while True:
+            # Start at a random slot, so a lightly loaded semaphore usually succeeds at once
+            start = random.randrange(self.slots)
+            for offset in range(self.slots):
+                key = f"{self.name}:{(start + offset) % self.slots}"
+                if cache.add(key, token, timeout=self.lease_seconds):
+                    return key, token
+
+            time.sleep(self.poll_seconds * (0.5 + random.random()))
+
+    def release(self, claim):
+        """Free a slot claimed by acquire(), unless its lease already expired and it was reclaimed"""
+        key, token = claim
+        if cache.get(key) == token:
+            cache.delete(key)
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the duration of a with block"""
+        claim = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(claim)
@@ -1,2 +1,45 @@
-from django.test import TestCase
+import json
+from django.test import SimpleTestCase
+from apps.integrations.coingecko.streaming import iter_json_array
 
+
+def split(payload, size):
+    """Encode a payload and cut it into chunks of at most size bytes"""
+    data = payload.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    def test_parses_elements(self):
+        payload = '[{"id": "bitcoin", "price": 1.5e3}, [1, 2], "x", 3, null, true]'
+        self.assertEqual(list(iter_json_array([payload.encode()])), json.loads(payload))
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([b'[]'])), [])
+        self.assertEqual(list(iter_json_array([b' [ ] '])), [])
+
+    def test_elements_split_across_chunks(self):
+        payload = json.dumps([{"id": "ethereum", "name": "Ether é中"}, 12345.678e-3, "a,]b", -17])
+        expected = json.loads(payload)
+        for size in (1, 2, 3, 7, 64):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_json_array(split(payload, size))), expected)
+
+    def test_number_cut_at_chunk_edge(self):
+        self.assertEqual(list(iter_json_array([b'[1.5e', b'3, 12', b'3]'])), [1500.0, 123])
+
+    def test_skips_empty_chunks(self):
+        self.assertEqual(list(iter_json_array([b'', b'[1', b'', b',2]', b''])), [1, 2])
+
+    def test_rejects_malformed_arrays(self):
+        for payload in ('[1 2]', '[1,,2]', '[,1]', '[1,]', '[1', '[', '', '{}', '1', '[1, x]'):
+            with self.subTest(payload=payload):
+                with self.assertRaises(ValueError):
+                    list(iter_json_array([payload.encode()]))
+
+    def test_yields_elements_before_an_error(self):
+        items = iter_json_array([b'[1, 2 3]'])
+        self.assertEqual(next(items), 1)
+        self.assertEqual(next(items), 2)
+        with self.assertRaises(ValueError):
+            next(items)
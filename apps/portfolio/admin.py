@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import WalletTokenBalance
+from .fixed_point import format_fixed, format_usd
+from .models import WalletTokenBalance, UserTokenValuation
 
 @admin.register(WalletTokenBalance)
 class WalletTokenBalanceAdmin(admin.ModelAdmin):
@@ -10,6 +11,31 @@ class WalletTokenBalanceAdmin(admin.ModelAdmin):
     search_fields = ('wallet__address', 'token__contract_address')
     list_filter = ('wallet__address', 'token__contract_address')
 
+    @admin.display(description='Balance')
+    def balance(self, obj):
+        return format_fixed(int(obj.raw_balance), obj.decimals)
+
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         return queryset.select_related('wallet', 'token')
+
+
+@admin.register(UserTokenValuation)
+class UserTokenValuationAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for UserTokenValuation model
+    """
+    list_display = ('user', 'token__master__symbol', 'token__chain', 'balance', 'value_usd', 'updated_at')
+    search_fields = ('user__username', 'token__master__symbol', 'token__contract_address')
+
+    @admin.display(description='Balance')
+    def balance(self, obj):
+        return format_fixed(int(obj.raw_balance), obj.decimals)
+
+    @admin.display(description='USD value', ordering='usd_value')
+    def value_usd(self, obj):
+        return format_usd(obj.usd_value)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.select_related('user', 'token__master')
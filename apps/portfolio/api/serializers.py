@@ -1,16 +1,63 @@
+from decimal import Decimal
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from config.chain_mapping import FRONTEND_TO_COINGECKO_MAPPING
+from ..fixed_point import format_fixed, format_price, format_usd
+from ..pagination import MAX_PAGE_SIZE, decode_cursor
+
+# Wallets per batch assets request
+MAX_BATCH_WALLETS = 100
+
+@extend_schema_field(OpenApiTypes.STR)
+class FixedPointField(serializers.Field):
+    """Read-only field rendering a fixed-point amount as a decimal string"""
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+class UsdAmountField(FixedPointField):
+    """Integer USD units (see fixed_point)"""
+    def to_representation(self, value):
+        return format_usd(value)
+
+class TokenAmountField(FixedPointField):
+    """(raw_balance, decimals) pair"""
+    def to_representation(self, value):
+        raw_balance, decimals = value
+        return format_fixed(int(raw_balance), decimals)
+
+class PriceField(FixedPointField):
+    """(mantissa, exponent) price"""
+    def to_representation(self, value):
+        mantissa, exponent = value
+        return format_price(mantissa, exponent)
 
 class WalletListSerializer(serializers.Serializer):
     """Serializer for wallet list with USD balance"""
     address = serializers.CharField()
     chain = serializers.CharField()
-    balance_usd = serializers.CharField()
+    balance_usd = UsdAmountField()
     name = serializers.CharField()
 
-class WalletAssetsRequestSerializer(serializers.Serializer):
+class TokenPageRequestSerializer(serializers.Serializer):
+    """Serializer for token list filters and keyset pagination"""
+    min_usd = serializers.DecimalField(max_digits=60, decimal_places=18, min_value=Decimal('0'), required=False, help_text="Minimum USD value per token")
+    search = serializers.CharField(max_length=100, required=False, help_text="Symbol or name fragment (case-insensitive)")
+    page_size = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, required=False, help_text="Tokens per page, highest USD value first (all tokens if omitted)")
+    cursor = serializers.CharField(required=False, help_text="next_cursor from the previous page")
+
+    def validate_cursor(self, value):
+        try:
+            decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError("Invalid cursor")
+        return value
+
+class WalletAssetsRequestSerializer(TokenPageRequestSerializer):
     """Serializer for wallet assets request"""
     address = serializers.CharField(max_length=255, help_text="Wallet address")
-    chain = serializers.CharField(max_length=50, help_text="Blockchain network")
+    chain = serializers.ChoiceField(choices=list(FRONTEND_TO_COINGECKO_MAPPING.keys()), help_text="Blockchain network")
 
 
 class TokenDataSerializer(serializers.Serializer):
@@ -20,26 +67,93 @@ class TokenDataSerializer(serializers.Serializer):
     symbol = serializers.CharField()
     name = serializers.CharField()
     logo = serializers.URLField(allow_blank=True, allow_null=True)
-    price_usd = serializers.CharField()
+    price_usd = PriceField()
     percentage_24h = serializers.CharField()
 
 class TokenBalanceSerializer(serializers.Serializer):
     """Serializer for individual Token balance"""
-    token_balance_formatted = serializers.CharField()
-    usd_value = serializers.CharField()
+    token_balance_formatted = TokenAmountField()
+    usd_value = UsdAmountField()
 
 class WalletTokenSerializer(serializers.Serializer):
     """Serializer for individual Token data and balance"""
     token_details = TokenDataSerializer()
     token_balance = TokenBalanceSerializer()
 
+    def to_representation(self, instance):
+        # Runs once per token: PortfolioService already builds token dicts in
+        # the output shape, so only format the fixed-point values instead of
+        # walking every nested field. The declared fields still drive the schema.
+        token_details = instance['token_details']
+        token_balance = instance['token_balance']
+        raw_balance, decimals = token_balance['token_balance_formatted']
+
+        return {
+            'token_details': {**token_details, 'price_usd': format_price(*token_details['price_usd'])},
+            'token_balance': {
+                'token_balance_formatted': format_fixed(int(raw_balance), decimals),
+                'usd_value': format_usd(token_balance['usd_value']),
+            },
+        }
+
 class WalletAssetsSerializer(serializers.Serializer):
     """Serializer for wallet assets list"""
     wallet_name = serializers.CharField(allow_blank=True, allow_null=True)
     wallet_address = serializers.CharField()
     wallet_chain = serializers.CharField()
     tokens = WalletTokenSerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True)
+
+class WalletRefSerializer(serializers.Serializer):
+    """Serializer for a wallet reference"""
+    address = serializers.CharField(max_length=255, help_text="Wallet address")
+    chain = serializers.ChoiceField(choices=list(FRONTEND_TO_COINGECKO_MAPPING.keys()), help_text="Blockchain network")
+
+class WalletAssetsBatchRequestSerializer(serializers.Serializer):
+    """Serializer for batch wallet assets request"""
+    wallets = WalletRefSerializer(many=True, required=False, min_length=1, max_length=MAX_BATCH_WALLETS, help_text="Wallets to return assets of")
+    all = serializers.BooleanField(default=False, help_text="Return assets of every wallet of the user instead")
+    min_usd = serializers.DecimalField(max_digits=60, decimal_places=18, min_value=Decimal('0'), required=False, help_text="Minimum USD value per token")
+    search = serializers.CharField(max_length=100, required=False, help_text="Symbol or name fragment (case-insensitive)")
+    page_size = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, required=False, help_text="Tokens per wallet, highest USD value first (all tokens if omitted)")
+
+    def validate(self, attrs):
+        if attrs['all'] == ('wallets' in attrs):
+            raise serializers.ValidationError("Provide either wallets or all")
+        return attrs
+
+class WalletAssetsBatchSerializer(serializers.Serializer):
+    """Serializer for assets of several wallets"""
+    wallets = WalletAssetsSerializer(many=True)
+
+class UserPortfolioRequestSerializer(TokenPageRequestSerializer):
+    """Serializer for aggregated portfolio query parameters"""
+    chain = serializers.ChoiceField(choices=list(FRONTEND_TO_COINGECKO_MAPPING.keys()), required=False, help_text="Only tokens on this chain")
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, required=False, help_text="Alias of page_size")
 
 class UserPortfolioSerializer(serializers.Serializer):
     """Serializer for aggregated user portfolio"""
+    total_usd = UsdAmountField(required=False)
     tokens = WalletTokenSerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True, required=False)
+
+
+class PortfolioHistoryRequestSerializer(serializers.Serializer):
+    """Serializer for portfolio history query parameters"""
+    days = serializers.IntegerField(min_value=1, max_value=3650, default=30, help_text="Number of days back from today")
+    address = serializers.CharField(max_length=255, required=False, help_text="Wallet address (wallet history instead of the whole portfolio)")
+    chain = serializers.ChoiceField(choices=list(FRONTEND_TO_COINGECKO_MAPPING.keys()), required=False, help_text="Wallet chain, required with address")
+
+    def validate(self, attrs):
+        if ('address' in attrs) != ('chain' in attrs):
+            raise serializers.ValidationError("Both address and chain are required for wallet history")
+        return attrs
+
+class HistoryPointSerializer(serializers.Serializer):
+    """Serializer for a single history point"""
+    date = serializers.DateField()
+    total_usd = UsdAmountField()
+
+class PortfolioHistorySerializer(serializers.Serializer):
+    """Serializer for portfolio value history"""
+    points = HistoryPointSerializer(many=True)
@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import UserWalletsListView, WalletAssetsView, UserPortfolioView
+from .views import UserWalletsListView, WalletAssetsView, WalletAssetsBatchView, UserPortfolioView, PortfolioHistoryView, PortfolioCacheStatsView
 
 urlpatterns = [
     path('', UserWalletsListView.as_view(), name='list-wallets'),
     path('wallet/', WalletAssetsView.as_view(), name='wallet-assets'),
+    path('wallet/batch/', WalletAssetsBatchView.as_view(), name='wallet-assets-batch'),
     path('allwallets/', UserPortfolioView.as_view(), name='user-portfolio'),
+    path('history/', PortfolioHistoryView.as_view(), name='portfolio-history'),
+    path('cache-stats/', PortfolioCacheStatsView.as_view(), name='portfolio-cache-stats'),
 ]
@@ -1,20 +1,38 @@
+from django.utils.cache import patch_cache_control
+from apps.portfolio.cache import PortfolioResponseCache
 from apps.portfolio.services.service import PortfolioService
+from apps.portfolio.services.snapshots import SnapshotService
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from drf_spectacular.utils import extend_schema
-from .serializers import WalletListSerializer, WalletAssetsSerializer, WalletAssetsRequestSerializer, UserPortfolioSerializer
+from .renderers import ORJSONRenderer
+from .serializers import WalletListSerializer, WalletAssetsSerializer, WalletAssetsRequestSerializer, WalletAssetsBatchRequestSerializer, WalletAssetsBatchSerializer, UserPortfolioRequestSerializer, UserPortfolioSerializer, PortfolioHistoryRequestSerializer, PortfolioHistorySerializer
+
+
+def _with_etag(response, etag):
+    """Attach an ETag and make clients revalidate it on every poll"""
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 
 class UserWalletsListView(APIView):
     """Get all wallets for authenticated user with USD balances"""
     permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     @extend_schema(
         summary="List user wallets",
-        description="Returns all wallets for the authenticated user with current USD balances",
+        description=(
+            "Returns all wallets for the authenticated user with current USD balances. "
+            "Responses carry an ETag; send it back in If-None-Match to get 304 while nothing changed."
+        ),
         responses={
             200: WalletListSerializer(many=True),
+            304: None,
             401: {"type": "object", "properties": {"error": {"type": "string"}}},
             500: {"type": "object", "properties": {"error": {"type": "string"}}}
         },
@@ -23,13 +41,24 @@ class UserWalletsListView(APIView):
     def get(self, request):
         """Get all user wallets with USD balances"""
         try:
+            response_cache = PortfolioResponseCache()
+            cache_key = response_cache.key(request.user, "wallets")
+            etag = response_cache.etag(cache_key, request.accepted_renderer.format)
+            if response_cache.not_modified(request, etag, "wallets"):
+                return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+            cached_data = response_cache.get(cache_key, "wallets")
+            if cached_data is not None:
+                return _with_etag(Response(cached_data, status=status.HTTP_200_OK), etag)
+
             # Use the portfolio service to get wallets with balances
             portfolio_service = PortfolioService()
             wallets_data = portfolio_service.get_user_wallets_with_balances(request.user)
             
             # Serialize the response
             serializer = WalletListSerializer(wallets_data, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            response_cache.set(cache_key, serializer.data)
+            return _with_etag(Response(serializer.data, status=status.HTTP_200_OK), etag)
             
         except Exception as e:
             return Response({
@@ -40,14 +69,19 @@ class UserWalletsListView(APIView):
 class WalletAssetsView(APIView):
     """Get detailed token list for a specific wallet"""
     permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     @extend_schema(
         summary="Get wallet assets",
-        description="Returns detailed token list with balances and USD values for a specific wallet",
+        description=(
+            "Returns detailed token list with balances and USD values for a specific wallet, "
+            "highest USD value first. Supports min_usd and search filters and keyset pagination "
+            "with page_size and cursor."
+        ),
         request=WalletAssetsRequestSerializer,
         responses={
             200: WalletAssetsSerializer,
-            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            400: {"type": "object", "properties": {"error": {"type": "string"}, "details": {"type": "object"}}},
             403: {"type": "object", "properties": {"error": {"type": "string"}}},
             404: {"type": "object", "properties": {"error": {"type": "string"}}}
         },
@@ -55,23 +89,30 @@ class WalletAssetsView(APIView):
     )
     def post(self, request):
         # Validate input
-        address = request.data.get('address')
-        chain = request.data.get('chain')
-        
-        if not address or not chain:
+        serializer = WalletAssetsRequestSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response({
-                "error": "Both address and chain are required"
+                "error": "Invalid input data",
+                "details": serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
         
         try:
+            response_cache = PortfolioResponseCache()
+            cache_key = response_cache.key(request.user, "wallet_assets", **params) # type: ignore
+            cached_data = response_cache.get(cache_key, "wallet_assets")
+            if cached_data is not None:
+                return Response(cached_data, status=status.HTTP_200_OK)
+
             portfolio_service = PortfolioService()
             wallet_data = portfolio_service.get_wallet_detailed_assets(
                 user=request.user,
-                address=address,
-                chain=chain
+                **params # type: ignore
             )
             
             serializer = WalletAssetsSerializer(wallet_data)
+            response_cache.set(cache_key, serializer.data)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except ValueError as e:
@@ -84,37 +125,218 @@ class WalletAssetsView(APIView):
                 "error": f"Failed to retrieve wallet assets: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class WalletAssetsBatchView(APIView):
+    """Get detailed token lists for several wallets in one request"""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    @extend_schema(
+        summary="Get assets of several wallets",
+        description=(
+            "Returns the wallet assets response of each listed wallet, or of every wallet of the user "
+            "with all=true, computed from a single balance query. Supports min_usd and search filters; "
+            "page_size limits tokens per wallet and each wallet's next_cursor can be passed to the "
+            "wallet assets endpoint."
+        ),
+        request=WalletAssetsBatchRequestSerializer,
+        responses={
+            200: WalletAssetsBatchSerializer,
+            400: {"type": "object", "properties": {"error": {"type": "string"}, "details": {"type": "object"}}},
+            404: {"type": "object", "properties": {"error": {"type": "string"}}},
+            500: {"type": "object", "properties": {"error": {"type": "string"}}}
+        },
+        tags=["Portfolio"]
+    )
+    def post(self, request):
+        serializer = WalletAssetsBatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                "error": "Invalid input data",
+                "details": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        params = dict(serializer.validated_data) # type: ignore
+        params.pop('all')
+        wallets = params.pop('wallets', None)
+
+        try:
+            response_cache = PortfolioResponseCache()
+            cache_key = response_cache.key(request.user, "wallet_assets_batch", wallets=wallets, **params)
+            cached_data = response_cache.get(cache_key, "wallet_assets_batch")
+            if cached_data is not None:
+                return Response(cached_data, status=status.HTTP_200_OK)
+
+            portfolio_service = PortfolioService()
+            wallets_data = portfolio_service.get_wallets_detailed_assets(
+                user=request.user,
+                wallets=wallets,
+                **params
+            )
+
+            serializer = WalletAssetsBatchSerializer({"wallets": wallets_data})
+            response_cache.set(cache_key, serializer.data)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return Response({
+                "error": str(e)
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        except Exception as e:
+            return Response({
+                "error": f"Failed to retrieve wallet assets: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class UserPortfolioView(APIView):
     """Get aggregated portfolio across all user wallets"""
     permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     @extend_schema(
         summary="Get aggregated user portfolio",
-        description="Returns aggregated tokens across all user wallets, sorted by USD value",
+        description=(
+            "Returns aggregated tokens across all user wallets, sorted by USD value. "
+            "Supports min_usd, chain and search filters and keyset pagination with page_size and cursor. "
+            "Responses carry an ETag; send it back in If-None-Match to get 304 while nothing changed."
+        ),
+        parameters=[UserPortfolioRequestSerializer],
         responses={
             200: UserPortfolioSerializer,
+            304: None,
+            400: {"type": "object", "properties": {"error": {"type": "string"}, "details": {"type": "object"}}},
             401: {"type": "object", "properties": {"error": {"type": "string"}}},
             500: {"type": "object", "properties": {"error": {"type": "string"}}}
         },
         tags=["Portfolio"]
     )
     def get(self, request):
+        query_serializer = UserPortfolioRequestSerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response({
+                "error": "Invalid query parameters",
+                "details": query_serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        params = dict(query_serializer.validated_data) # type: ignore
+        limit = params.pop('limit', None)
+        if limit and not params.get('page_size'):
+            params['page_size'] = limit
+
         try:
+            response_cache = PortfolioResponseCache()
+            cache_key = response_cache.key(request.user, "portfolio", **params)
+            etag = response_cache.etag(cache_key, request.accepted_renderer.format)
+            if response_cache.not_modified(request, etag, "portfolio"):
+                return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+            cached_data = response_cache.get(cache_key, "portfolio")
+            if cached_data is not None:
+                return _with_etag(Response(cached_data, status=status.HTTP_200_OK), etag)
+
             portfolio_service = PortfolioService()
-            portfolio_data = portfolio_service.get_user_aggregated_portfolio(request.user)
+            portfolio_data = portfolio_service.get_user_aggregated_portfolio(request.user, **params)
             
             # Check if it's a "no wallets" response
             if "message" in portfolio_data and portfolio_data["message"] == "User has no wallets":
-                return Response({
+                return _with_etag(Response({
                     "message": "User has no wallets",
                     "tokens": []
-                }, status=status.HTTP_200_OK)
+                }, status=status.HTTP_200_OK), etag)
             
             # Use serializer for normal response
             serializer = UserPortfolioSerializer(portfolio_data)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+
+            # Don't keep a failed read around until the next version bump
+            if "message" in portfolio_data:
+                return Response(serializer.data, status=status.HTTP_200_OK)
+
+            response_cache.set(cache_key, serializer.data)
+            return _with_etag(Response(serializer.data, status=status.HTTP_200_OK), etag)
             
         except Exception as e:
             return Response({
                 "error": f"Failed to retrieve portfolio: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PortfolioHistoryView(APIView):
+    """Get daily USD value history of the user's portfolio or of one wallet"""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    @extend_schema(
+        summary="Get portfolio value history",
+        description=(
+            "Returns daily USD totals, oldest first, for the whole portfolio or for one wallet "
+            "(address and chain). Points older than the retention window are weekly."
+        ),
+        parameters=[PortfolioHistoryRequestSerializer],
+        responses={
+            200: PortfolioHistorySerializer,
+            400: {"type": "object", "properties": {"error": {"type": "string"}, "details": {"type": "object"}}},
+            401: {"type": "object", "properties": {"error": {"type": "string"}}},
+            404: {"type": "object", "properties": {"error": {"type": "string"}}}
+        },
+        tags=["Portfolio"]
+    )
+    def get(self, request):
+        query_serializer = PortfolioHistoryRequestSerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response({
+                "error": "Invalid query parameters",
+                "details": query_serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        params = query_serializer.validated_data
+
+        try:
+            snapshot_service = SnapshotService()
+            if 'address' in params: # type: ignore
+                points = snapshot_service.get_wallet_history(
+                    request.user,
+                    params['address'], # type: ignore
+                    params['chain'], # type: ignore
+                    params['days'] # type: ignore
+                )
+            else:
+                points = snapshot_service.get_user_history(request.user, params['days']) # type: ignore
+
+            serializer = PortfolioHistorySerializer({"points": points})
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return Response({
+                "error": str(e)
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        except Exception as e:
+            return Response({
+                "error": f"Failed to retrieve portfolio history: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PortfolioCacheStatsView(APIView):
+    """Get portfolio response cache hit and miss counts"""
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        summary="Get portfolio cache stats",
+        description="Returns response cache hits, misses and hit rate per portfolio endpoint and in total (admin only)",
+        responses={
+            200: {
+                "type": "object",
+                "additionalProperties": {
+                    "type": "object",
+                    "properties": {
+                        "hits": {"type": "integer"},
+                        "misses": {"type": "integer"},
+                        "hit_rate": {"type": "number", "nullable": True}
+                    }
+                }
+            },
+            403: {"type": "object", "properties": {"detail": {"type": "string"}}}
+        },
+        tags=["Portfolio"]
+    )
+    def get(self, request):
+        return Response(PortfolioResponseCache().get_stats(), status=status.HTTP_200_OK)
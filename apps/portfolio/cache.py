@@ -0,0 +1,240 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+
+USER_VERSION_KEY = "portfolio:user_version:{user_id}"
+PRICE_VERSION_KEY = "portfolio:price_version"
+RESPONSE_KEY = "portfolio:response:{endpoint}:{user_id}:{user_version}:{price_version}:{params}"
+STATS_KEY = "portfolio:cache_stats:{endpoint}:{outcome}"
+
+ENDPOINTS = ("wallets", "wallet_assets", "wallet_assets_batch", "portfolio")
+
+# Hit/miss counts are buffered per process and added to the shared counters
+# at most this often, so counting costs no cache round trip on a request
+STATS_FLUSH_SECONDS = 10
+
+
+def _new_version():
+    # Random rather than a counter, so an evicted version never repeats an old one
+    return uuid.uuid4().hex[:12]
+
+
+def get_user_version(user_id):
+    """Get the data version of a user, creating it if missing"""
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_price_version():
+    """Get the global price version, creating it if missing"""
+    version = cache.get(PRICE_VERSION_KEY)
+    if version is None:
+        cache.add(PRICE_VERSION_KEY, _new_version(), timeout=None)
+        version = cache.get(PRICE_VERSION_KEY)
+    return version
+
+
+def get_versions(user_id):
+    """
+    Get the data version of a user and the price version in one cache round trip
+
+    Returns:
+        tuple: (user_version, price_version)
+    """
+    user_key = USER_VERSION_KEY.format(user_id=user_id)
+    versions = cache.get_many([user_key, PRICE_VERSION_KEY])
+
+    user_version = versions.get(user_key) or get_user_version(user_id)
+    price_version = versions.get(PRICE_VERSION_KEY) or get_price_version()
+    return user_version, price_version
+
+
+def bump_user_versions(user_ids):
+    """
+    Invalidate cached responses of some users
+
+    Args:
+        user_ids: Ids of users whose wallets or balances changed
+    """
+    versions = {USER_VERSION_KEY.format(user_id=user_id): _new_version() for user_id in set(user_ids)}
+    if versions:
+        cache.set_many(versions, timeout=None)
+
+
+def new_price_version():
+    """Create a price version id without making it current (see bump_price_version)"""
+    return _new_version()
+
+
+def bump_price_version(version=None):
+    """
+    Invalidate cached responses of every user after prices changed
+
+    Args:
+        version: Version from new_price_version() whose price snapshot was
+            published beforehand (a new one by default)
+
+    Returns:
+        str: The new price version
+    """
+    version = version or _new_version()
+    cache.set(PRICE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+class PortfolioResponseCache:
+    """
+    Per-user cache of portfolio endpoint responses
+
+    Keys embed the user's data version and the global price version, so
+    bumping either one invalidates every affected response at once; old
+    entries are never read again and simply expire. ETags are derived from
+    the same key, so a client holding the current one can be answered with
+    304 Not Modified without building the response.
+    """
+
+    # Counts not yet added to the shared counters, for every instance in the process
+    _pending_counts = Counter()
+    _pending_lock = threading.Lock()
+    _last_flush = time.monotonic()
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or getattr(settings, "PORTFOLIO_CACHE_TIMEOUT", 60 * 60)
+
+    def key(self, user, endpoint, **params):
+        """
+        Build the cache key of a response
+
+        Args:
+            user: User instance
+            endpoint: One of ENDPOINTS
+            **params: Request parameters that change the response
+
+        Returns:
+            str: Cache key for the current user and price versions
+        """
+        params_digest = hashlib.blake2b(repr(sorted(params.items())).encode(), digest_size=8).hexdigest()
+        user_version, price_version = get_versions(user.pk)
+        return RESPONSE_KEY.format(
+            endpoint=endpoint,
+            user_id=user.pk,
+            user_version=user_version,
+            price_version=price_version,
+            params=params_digest,
+        )
+
+    def etag(self, key, media_format):
+        """
+        Build the strong ETag of a response
+
+        Args:
+            key: Cache key from key()
+            media_format: Format of the accepted renderer (e.g. "json")
+
+        Returns:
+            str: Quoted ETag, changes whenever the user's data or prices change
+        """
+        digest = hashlib.blake2b(f"{key}:{media_format}".encode(), digest_size=16).hexdigest()
+        return f'"{digest}"'
+
+    def not_modified(self, request, etag, endpoint):
+        """
+        Check whether the client already has the current response
+
+        A match counts as a cache hit.
+
+        Args:
+            request: Request with an optional If-None-Match header
+            etag: Current ETag from etag()
+            endpoint: One of ENDPOINTS
+
+        Returns:
+            bool: True if the request can be answered with 304 Not Modified
+        """
+        header = request.headers.get("If-None-Match")
+        if not header:
+            return False
+
+        # If-None-Match uses weak comparison
+        etags = [tag.removeprefix("W/") for tag in parse_etags(header)]
+        if "*" not in etags and etag not in etags:
+            return False
+
+        self._count(endpoint, "hits")
+        return True
+
+    def get(self, key, endpoint):
+        """Get a cached response, or None, counting the hit or miss"""
+        data = cache.get(key)
+        self._count(endpoint, "hits" if data is not None else "misses")
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, timeout=self.timeout)
+
+    def get_stats(self):
+        """
+        Get hit and miss counts per endpoint and in total
+
+        Counts of other processes may lag by up to STATS_FLUSH_SECONDS.
+
+        Returns:
+            dict: Counts and hit rate per endpoint, plus a "total" entry
+        """
+        self.flush_stats()
+        counts = cache.get_many([
+            STATS_KEY.format(endpoint=endpoint, outcome=outcome)
+            for endpoint in ENDPOINTS
+            for outcome in ("hits", "misses")
+        ])
+
+        stats = {}
+        for endpoint in ENDPOINTS + ("total",):
+            if endpoint == "total":
+                hits = sum(entry["hits"] for entry in stats.values())
+                misses = sum(entry["misses"] for entry in stats.values())
+            else:
+                hits = counts.get(STATS_KEY.format(endpoint=endpoint, outcome="hits"), 0)
+                misses = counts.get(STATS_KEY.format(endpoint=endpoint, outcome="misses"), 0)
+
+            stats[endpoint] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            }
+
+        return stats
+
+    def flush_stats(self):
+        """Add this process's buffered counts to the shared counters"""
+        cls = type(self)
+        with cls._pending_lock:
+            pending = dict(cls._pending_counts)
+            cls._pending_counts.clear()
+            cls._last_flush = time.monotonic()
+
+        for key, delta in pending.items():
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                # First count, or the counter was evicted
+                if not cache.add(key, delta, timeout=None):
+                    cache.incr(key, delta)
+
+    def _count(self, endpoint, outcome):
+        cls = type(self)
+        with cls._pending_lock:
+            cls._pending_counts[STATS_KEY.format(endpoint=endpoint, outcome=outcome)] += 1
+            due = time.monotonic() - cls._last_flush >= STATS_FLUSH_SECONDS
+
+        if due:
+            self.flush_stats()
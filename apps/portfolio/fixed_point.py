@@ -0,0 +1,109 @@
+from decimal import Context, Decimal, ROUND_CEILING
+
+# Token balances are raw on-chain integers with the token's decimals, prices
+# are an integer mantissa with a base-10 exponent and USD amounts are
+# integers of 10 ** -USD_DECIMALS dollars. Valuation is integer arithmetic;
+# amounts become decimal strings only when a response is serialized.
+USD_DECIMALS = 6
+
+# Largest stored USD amount ($10^12), keeps sums of capped rows within BigIntegerField
+MAX_USD_UNITS = 10 ** 18
+
+# Significant digits kept from a price (CoingeckoPrice.price_mantissa is a BigIntegerField)
+PRICE_DIGITS = 18
+
+# Enough precision for any DecimalField used in query parameters
+_EXACT = Context(prec=100)
+
+
+def price_to_fixed(price):
+    """
+    Split a price into an integer mantissa and a base-10 exponent
+
+    Args:
+        price: Decimal, int, str or float price; more than PRICE_DIGITS
+            significant digits are rounded away
+
+    Returns:
+        tuple: (mantissa, exponent) with price == mantissa * 10 ** exponent
+
+    Raises:
+        ValueError: If the price is not a finite number
+    """
+    context = Context(prec=PRICE_DIGITS)
+    value = context.create_decimal(str(price) if isinstance(price, float) else price)
+    if not value.is_finite():
+        raise ValueError(f"Invalid price: {price}")
+    if not value:
+        return 0, 0
+
+    sign, digits, exponent = value.normalize(context).as_tuple()
+    mantissa = int(''.join(map(str, digits)))
+    return (-mantissa if sign else mantissa), exponent
+
+
+def clamp_usd(units):
+    """Limit a USD amount to what the valuation columns store"""
+    return max(-MAX_USD_UNITS, min(units, MAX_USD_UNITS))
+
+
+def usd_units(raw_balance, decimals, price_mantissa, price_exponent):
+    """
+    Value a raw token balance at a fixed-point price
+
+    Args:
+        raw_balance: On-chain integer balance
+        decimals: Token decimals
+        price_mantissa: Price mantissa (0 when unpriced)
+        price_exponent: Price exponent
+
+    Returns:
+        int: USD value in units of 10 ** -USD_DECIMALS, rounded down
+    """
+    units = int(raw_balance) * price_mantissa
+    shift = price_exponent + USD_DECIMALS - decimals
+    if shift >= 0:
+        units *= 10 ** shift
+    else:
+        units //= 10 ** -shift
+    return clamp_usd(units)
+
+
+def decimal_to_usd_units(amount):
+    """Convert a decimal dollar amount (e.g. a min_usd filter) to USD units, rounded up"""
+    units = Decimal(amount).scaleb(USD_DECIMALS, context=_EXACT)
+    return int(units.to_integral_value(rounding=ROUND_CEILING))
+
+
+def usd_units_to_decimal(units):
+    """Convert USD units to a Decimal dollar amount"""
+    return Decimal(units).scaleb(-USD_DECIMALS, context=_EXACT)
+
+
+def format_fixed(value, decimals):
+    """
+    Format an integer scaled by 10 ** -decimals as an exact decimal string
+
+    Args:
+        value: Scaled integer
+        decimals: Number of decimal places (may be negative)
+
+    Returns:
+        str: e.g. format_fixed(1500000, 6) == "1.500000"
+    """
+    if decimals <= 0:
+        return str(value * 10 ** -decimals)
+
+    whole, fraction = divmod(abs(value), 10 ** decimals)
+    sign = '-' if value < 0 else ''
+    return f"{sign}{whole}.{fraction:0{decimals}d}"
+
+
+def format_usd(units):
+    """Format USD units as a dollar string"""
+    return format_fixed(units, USD_DECIMALS)
+
+
+def format_price(mantissa, exponent):
+    """Format a fixed-point price as a decimal string"""
+    return format_fixed(mantissa, -exponent)
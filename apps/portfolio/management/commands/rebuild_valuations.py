@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.portfolio.services.valuation import ValuationService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild wallet, user and user-token valuations from balances and prices'
+
+    def handle(self, *_args, **_kwargs):
+        counts = ValuationService().rebuild()
+        self.stdout.write(f"Rebuilt valuations for {counts['wallets']} wallets and {counts['users']} users")
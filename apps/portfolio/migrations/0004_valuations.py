@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0003_wallettokenbalance_portfolio_w_wallet__76a670_idx_and_more'),
+        ('tokens', '0006_tokenmaster_coingecko_fingerprint'),
+        ('users', '0001_initial'),
+        ('wallets', '0003_wallet_refresh_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserValuation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='valuation', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_usd', models.DecimalField(decimal_places=18, default=0, max_digits=60)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WalletValuation',
+            fields=[
+                ('wallet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='valuation', serialize=False, to='wallets.wallet')),
+                ('total_usd', models.DecimalField(decimal_places=18, default=0, max_digits=60)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserTokenValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=18, max_digits=40)),
+                ('usd_value', models.DecimalField(decimal_places=18, default=0, max_digits=60)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('token', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tokens.token')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-usd_value'], name='portfolio_u_user_id_b791ec_idx')],
+                'unique_together': {('user', 'token')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0004_valuations'),
+        ('tokens', '0006_tokenmaster_coingecko_fingerprint'),
+        ('wallets', '0003_wallet_refresh_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='usertokenvaluation',
+            name='portfolio_u_user_id_b791ec_idx',
+        ),
+        migrations.AddField(
+            model_name='wallettokenbalance',
+            name='usd_value',
+            field=models.DecimalField(decimal_places=18, default=0, max_digits=60),
+        ),
+        migrations.AddIndex(
+            model_name='usertokenvaluation',
+            index=models.Index(fields=['user', '-usd_value', 'token'], name='portfolio_u_user_id_9924fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettokenbalance',
+            index=models.Index(fields=['wallet', '-usd_value', 'token'], name='portfolio_w_wallet__093bb5_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Least
+
+# Keep in sync with apps.portfolio.fixed_point
+USD_DECIMALS = 6
+MAX_USD_UNITS = 10 ** 18
+
+# Decimal places of the old balance columns
+BALANCE_DECIMALS = 18
+
+
+def convert_amounts(apps, schema_editor):
+    """
+    Move balances to raw integers and USD amounts to USD units
+
+    Existing balances keep 18 decimals until their wallet is synced again.
+    USD columns are scaled here and cast to integers by the next migration.
+    """
+    for model_name in ('WalletTokenBalance', 'UserTokenValuation'):
+        model = apps.get_model('portfolio', model_name)
+        model.objects.update(raw_balance=F('balance') * 10 ** BALANCE_DECIMALS, decimals=BALANCE_DECIMALS)
+
+    usd_columns = [
+        ('WalletTokenBalance', 'usd_value'),
+        ('UserTokenValuation', 'usd_value'),
+        ('WalletValuation', 'total_usd'),
+        ('UserValuation', 'total_usd'),
+        ('UserValueSnapshot', 'total_usd'),
+        ('WalletValueSnapshot', 'total_usd'),
+    ]
+    for model_name, field_name in usd_columns:
+        model = apps.get_model('portfolio', model_name)
+        model.objects.update(**{
+            field_name: Least(F(field_name) * 10 ** USD_DECIMALS, Value(Decimal(MAX_USD_UNITS)))
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0006_value_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallettokenbalance',
+            name='raw_balance',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=78),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='wallettokenbalance',
+            name='decimals',
+            field=models.PositiveSmallIntegerField(default=18),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='usertokenvaluation',
+            name='raw_balance',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=80),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='usertokenvaluation',
+            name='decimals',
+            field=models.PositiveSmallIntegerField(default=18),
+            preserve_default=False,
+        ),
+        migrations.RunPython(convert_amounts, migrations.RunPython.noop),
+    ]
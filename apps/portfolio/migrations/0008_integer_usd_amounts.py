@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0007_fixed_point_amounts'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='wallettokenbalance',
+            name='balance',
+        ),
+        migrations.RemoveField(
+            model_name='usertokenvaluation',
+            name='balance',
+        ),
+        migrations.AlterField(
+            model_name='wallettokenbalance',
+            name='usd_value',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='usertokenvaluation',
+            name='usd_value',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='walletvaluation',
+            name='total_usd',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='uservaluation',
+            name='total_usd',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='uservaluesnapshot',
+            name='total_usd',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='walletvaluesnapshot',
+            name='total_usd',
+            field=models.BigIntegerField(),
+        ),
+    ]
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.db import models
 from apps.tokens.models import Token
 from apps.wallets.models import Wallet
+from .fixed_point import format_fixed, format_usd
 
 
 class WalletTokenBalance(models.Model):
@@ -9,15 +11,98 @@ class WalletTokenBalance(models.Model):
     """
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE)
     token = models.ForeignKey(Token, on_delete=models.CASCADE)
-    balance = models.DecimalField(max_digits=36, decimal_places=18)
+    # Raw on-chain integer balance, the amount is raw_balance / 10 ** decimals
+    raw_balance = models.DecimalField(max_digits=78, decimal_places=0)
+    decimals = models.PositiveSmallIntegerField()
     last_updated = models.DateTimeField(auto_now=True)
 
+    # balance x CoinGecko price in USD units (see fixed_point), maintained by ValuationService
+    usd_value = models.BigIntegerField(default=0)
+
     class Meta:
         unique_together = ('wallet', 'token')
         indexes = [
             models.Index(fields=['wallet', 'token']),  # Compound index
             models.Index(fields=['wallet']),           # For wallet filtering
+            models.Index(fields=['wallet', '-usd_value', 'token']),  # Wallet assets, highest value first
         ]
 
     def __str__(self):
-        return f"{self.wallet.address}: {self.token.contract_address} - ({self.balance})"
+        return f"{self.wallet.address}: {self.token.contract_address} - ({format_fixed(int(self.raw_balance), self.decimals)})"
+
+
+class WalletValuation(models.Model):
+    """
+    Maintained USD total of a wallet, see ValuationService
+    """
+    wallet = models.OneToOneField(Wallet, on_delete=models.CASCADE, primary_key=True, related_name='valuation')
+    total_usd = models.BigIntegerField(default=0)  # USD units, see fixed_point
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.wallet.address}: ${format_usd(self.total_usd)}"
+
+
+class UserValuation(models.Model):
+    """
+    Maintained USD total across all wallets of a user, see ValuationService
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='valuation')
+    total_usd = models.BigIntegerField(default=0)  # USD units, see fixed_point
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user}: ${format_usd(self.total_usd)}"
+
+
+class UserTokenValuation(models.Model):
+    """
+    Maintained balance and USD value of a token summed across a user's wallets
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    token = models.ForeignKey(Token, on_delete=models.CASCADE)
+    raw_balance = models.DecimalField(max_digits=80, decimal_places=0)
+    decimals = models.PositiveSmallIntegerField()
+    usd_value = models.BigIntegerField(default=0)  # USD units, see fixed_point
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'token')
+        indexes = [
+            models.Index(fields=['user', '-usd_value', 'token']),  # Portfolio, highest value first
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.token} - ({format_fixed(int(self.raw_balance), self.decimals)}, ${format_usd(self.usd_value)})"
+
+
+class UserValueSnapshot(models.Model):
+    """
+    Daily USD total of a user's portfolio, for history charts
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    date = models.DateField()
+    total_usd = models.BigIntegerField()  # USD units, see fixed_point
+
+    class Meta:
+        # Also serves (user, date range) chart queries
+        unique_together = ('user', 'date')
+
+    def __str__(self):
+        return f"{self.user} {self.date}: ${format_usd(self.total_usd)}"
+
+
+class WalletValueSnapshot(models.Model):
+    """
+    Daily USD total of a wallet, for history charts
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE)
+    date = models.DateField()
+    total_usd = models.BigIntegerField()  # USD units, see fixed_point
+
+    class Meta:
+        # Also serves (wallet, date range) chart queries
+        unique_together = ('wallet', 'date')
+
+    def __str__(self):
+        return f"{self.wallet.address} {self.date}: ${format_usd(self.total_usd)}"
@@ -0,0 +1,99 @@
+import base64
+from django.db.models import Q
+from .fixed_point import decimal_to_usd_units
+
+# Page size cap for token lists
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(usd_value, token_id):
+    """Encode the position after a row as an opaque cursor"""
+    return base64.urlsafe_b64encode(f"{usd_value}|{token_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (usd_value int, token_id int)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        usd_value, token_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return int(usd_value), int(token_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def filter_tokens(queryset, min_usd=None, chain=None, search=None):
+    """
+    Apply token list filters in the database
+
+    Args:
+        queryset: Queryset of rows with usd_value and a token relation
+        min_usd: Minimum USD value per row, in dollars
+        chain: CoinGecko chain name
+        search: Case-insensitive symbol or name fragment
+
+    Returns:
+        QuerySet: Filtered queryset
+    """
+    if min_usd is not None:
+        queryset = queryset.filter(usd_value__gte=decimal_to_usd_units(min_usd))
+    if chain:
+        queryset = queryset.filter(token__chain=chain)
+    if search:
+        queryset = queryset.filter(
+            Q(token__master__symbol__icontains=search) | Q(token__master__name__icontains=search)
+        )
+    return queryset
+
+
+def paginate_by_usd_value(queryset, page_size=None, cursor=None, keep=None):
+    """
+    Keyset pagination ordered by USD value (highest first), then token id
+
+    Only page_size + 1 rows are read per query, whatever the offset; rows
+    rejected by keep are skipped and the scan continues after them.
+
+    Args:
+        queryset: Queryset of rows with usd_value and token_id
+        page_size: Rows per page, None for every remaining row
+        cursor: Cursor returned with the previous page
+        keep: Optional predicate, rows it rejects are left out of the page
+
+    Returns:
+        tuple: (list of rows, next cursor or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    queryset = queryset.order_by('-usd_value', 'token_id')
+    scan = _after(queryset, *decode_cursor(cursor)) if cursor else queryset
+
+    if not page_size:
+        return [row for row in scan if keep is None or keep(row)], None
+
+    rows = []
+    while True:
+        batch = list(scan[:page_size + 1])
+        rows.extend(row for row in batch if keep is None or keep(row))
+        if len(rows) > page_size or len(batch) <= page_size:
+            break
+        scan = _after(queryset, batch[-1].usd_value, batch[-1].token_id)
+
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1].usd_value, rows[-1].token_id)
+
+
+def _after(queryset, usd_value, token_id):
+    """Rows that come after (usd_value, token_id) in USD value order"""
+    return queryset.filter(
+        Q(usd_value__lt=usd_value) | Q(usd_value=usd_value, token_id__gt=token_id)
+    )
@@ -1,70 +1,22 @@
-from decimal import Decimal
-from ..models import WalletTokenBalance
-from apps.prices.models import CoingeckoPrice
+from collections import Counter, defaultdict
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from ..models import WalletTokenBalance, UserTokenValuation, UserValuation, WalletValuation
+from ..pagination import encode_cursor, filter_tokens, paginate_by_usd_value
+from apps.prices.services.service import PriceSnapshot
 from apps.wallets.models import UserWallet
 from config.chain_mapping import FRONTEND_TO_COINGECKO_MAPPING, COINGECKO_TO_FRONTEND_MAPPING
 
+# Columns read for a token row; prices come from PriceSnapshot, not a join
+TOKEN_ROW_FIELDS = (
+    'token', 'raw_balance', 'decimals', 'usd_value',
+    'token__contract_address', 'token__chain',
+    'token__master__symbol', 'token__master__name', 'token__master__image',
+)
+
 class PortfolioService:
     """Service for portfolio calculations and USD value computations"""
 
-    def calculate_token_balance_usd(self, wallet_token_balance):
-        """
-        Calculate USD value for a single token balance
-        
-        Args:
-            wallet_token_balance: WalletTokenBalance instance
-            
-        Returns:
-            Decimal: USD value of the token balance
-        """
-        try:
-            # WalletTokenBalance -> Token -> TokenMaster -> CoingeckoPrice
-            price_usd = wallet_token_balance.token.master.coingecko_price.price_usd
-            
-            # Calculate USD value: balance × price
-            usd_value = wallet_token_balance.balance * price_usd
-            
-            return usd_value
-        except CoingeckoPrice.DoesNotExist:
-            print(f"No CoinGecko price for token: {wallet_token_balance.token.master.name}")
-            return Decimal('0')
-        except AttributeError:
-            print(f"Missing relationship data for token: {wallet_token_balance.token}")
-            return Decimal('0')
-        except Exception as e:
-            print(f"Error calculating USD value: {e}")
-            return Decimal('0')
-        
-
-    def calculate_wallet_total_usd(self, wallet):
-        """
-        Calculate total USD value for all tokens in a wallet
-        
-        Args:
-            wallet: Wallet instance
-            
-        Returns:
-            Decimal: Total USD value of the wallet
-        """
-        try:
-            token_balances = WalletTokenBalance.objects.filter(wallet=wallet).select_related(
-                'token',                           # Fetch token data
-                'token__master',                   # Fetch token master data  
-                'token__master__coingecko_price'   # Fetch price data
-            )      
-            
-            total_usd = Decimal('0')
-            # Calculate USD value for each token and sum them up
-            for token_balance in token_balances:
-                token_usd = self.calculate_token_balance_usd(token_balance)
-                total_usd += token_usd
-            
-            return total_usd
-            
-        except Exception as e:
-            print(f"Error calculating wallet total USD: {e}")
-            return Decimal('0')
-
     def get_user_wallets_with_balances(self, user):
         """
         Get all wallets for a user with their USD balances
@@ -76,22 +28,26 @@ class PortfolioService:
             List of dicts with wallet info and USD balance
         """
         try:
-            # Get all wallets for this user through UserWallet relationship
-            user_wallets = UserWallet.objects.select_related('wallet').filter(user=user)
+            # Get all wallets for this user with their maintained USD totals
+            user_wallets = UserWallet.objects.select_related('wallet__valuation').filter(user=user).order_by('pk')
             
             wallets_data = []
             
             for user_wallet in user_wallets:
                 wallet = user_wallet.wallet
                 
-                # Calculate total USD balance for this wallet
-                balance_usd = self.calculate_wallet_total_usd(wallet)
+                # Wallets never synced have no valuation yet
+                try:
+                    balance_usd = wallet.valuation.total_usd
+                except WalletValuation.DoesNotExist:
+                    balance_usd = 0
+
                 frontend_chain = COINGECKO_TO_FRONTEND_MAPPING[wallet.chain]
                 # Create the response data
                 wallet_data = {
                     'address': wallet.address,
                     'chain': frontend_chain,
-                    'balance_usd': str(balance_usd),
+                    'balance_usd': balance_usd,
                     'name': user_wallet.name,
                 }
                 
@@ -103,17 +59,24 @@ class PortfolioService:
             print(f"Error getting user wallets: {e}")
             return []
 
-    def get_wallet_detailed_assets(self, user, address, chain):
+    def get_wallet_detailed_assets(self, user, address, chain, min_usd=None, search=None, page_size=None, cursor=None):
         """
         Get detailed token list with balances and USD values for a specific wallet
         
+        Tokens are filtered, ordered by USD value and paginated in the
+        database. Tokens without a CoinGecko price are left out.
+        
         Args:
             user: User instance
             address: Wallet address string
             chain: Chain name string (frontend variant)
+            min_usd: Optional minimum USD value per token
+            search: Optional symbol or name fragment
+            page_size: Optional number of tokens per page
+            cursor: Optional cursor returned with the previous page
             
         Returns:
-            dict: Formatted wallet data with detailed token list
+            dict: Formatted wallet data with a page of tokens and the next cursor
             
         Raises:
             ValueError: If wallet not found or doesn't belong to user
@@ -128,91 +91,219 @@ class PortfolioService:
             )
             wallet = user_wallet.wallet
             
-            # Get all token balances
-            token_balances = WalletTokenBalance.objects.filter(
-                wallet=wallet
-            ).select_related(
-                'token__master__coingecko_price'
+            # Get a page of priced token balances, highest value first
+            prices = PriceSnapshot.current()
+            token_balances = filter_tokens(
+                WalletTokenBalance.objects.filter(
+                    wallet=wallet
+                ).select_related(
+                    'token__master'
+                ).only(*TOKEN_ROW_FIELDS),
+                min_usd=min_usd,
+                search=search
+            )
+            token_balances, next_cursor = paginate_by_usd_value(
+                token_balances, page_size, cursor, keep=lambda row: row.token_id in prices
             )
             
-            tokens_data = []
+            return self._wallet_assets_data(user_wallet, token_balances, next_cursor, prices)
+            
+        except UserWallet.DoesNotExist:
+            raise ValueError("Wallet not found or doesn't belong to user")
+
+    def get_wallets_detailed_assets(self, user, wallets=None, min_usd=None, search=None, page_size=None):
+        """
+        Get detailed token lists of several wallets at once
+        
+        Balances of every wallet are read with one query, partitioned by
+        wallet with a window function so that only the first page of each
+        wallet is fetched. A wallet whose page was cut short by unpriced
+        tokens is completed with its own keyset scan.
+        
+        Args:
+            user: User instance
+            wallets: List of dicts with address and chain (frontend variant),
+                None for every wallet of the user
+            min_usd: Optional minimum USD value per token
+            search: Optional symbol or name fragment
+            page_size: Optional number of tokens per wallet
+            
+        Returns:
+            list: Wallet data in the get_wallet_detailed_assets format, in
+            request order (or the user's wallet order)
             
-            for token_balance in token_balances:
-                usd_value = self.calculate_token_balance_usd(token_balance)
+        Raises:
+            ValueError: If a wallet is not found or doesn't belong to user
+        """
+        user_wallets = UserWallet.objects.select_related('wallet').filter(user=user).order_by('pk')
 
-                # Extract price object to avoid repetition
-                price_obj = token_balance.token.master.coingecko_price
+        if wallets is None:
+            user_wallets = list(user_wallets)
+        else:
+            requested = list(dict.fromkeys(
+                (wallet['address'], FRONTEND_TO_COINGECKO_MAPPING[wallet['chain']]) for wallet in wallets
+            ))
+            wallet_filter = Q()
+            for address, chain in requested:
+                wallet_filter |= Q(wallet__address=address, wallet__chain=chain)
 
-                token_data = {
-                    "token_details": {
-                        "address": token_balance.token.contract_address,
-                        "chain": token_balance.token.chain,
-                        "symbol": token_balance.token.master.symbol,
-                        "name": token_balance.token.master.name,
-                        "logo": token_balance.token.master.image,
-                        "price_usd": str(price_obj.price_usd),
-                        "percentage_24h": str(price_obj.percentage_24h),
-                    },
-                    "token_balance": {
-                        "token_balance_formatted": str(token_balance.balance),
-                        "usd_value": str(usd_value)
-                    }
-                }
-                
-                tokens_data.append(token_data)
+            found = {
+                (user_wallet.wallet.address, user_wallet.wallet.chain): user_wallet
+                for user_wallet in user_wallets.filter(wallet_filter)
+            }
+            for address, chain in requested:
+                if (address, chain) not in found:
+                    raise ValueError(f"Wallet not found or doesn't belong to user: {address} ({COINGECKO_TO_FRONTEND_MAPPING[chain]})")
+
+            user_wallets = [found[key] for key in requested]
+
+        if not user_wallets:
+            return []
+
+        prices = PriceSnapshot.current()
+
+        def keep(token_balance):
+            return token_balance.token_id in prices
+
+        def wallet_balances(wallet_ids):
+            return filter_tokens(
+                WalletTokenBalance.objects.filter(
+                    wallet_id__in=wallet_ids
+                ).select_related(
+                    'token__master'
+                ).only('wallet', *TOKEN_ROW_FIELDS),
+                min_usd=min_usd,
+                search=search
+            )
+
+        token_balances = wallet_balances([user_wallet.wallet_id for user_wallet in user_wallets])
+        if page_size:
+            # First page_size + 1 rows of each wallet, so a next page can be detected
+            token_balances = token_balances.annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F('wallet_id'),
+                    order_by=[F('usd_value').desc(), F('token_id').asc()]
+                )
+            ).filter(position__lte=page_size + 1)
+
+        fetched_counts = Counter()
+        balances_by_wallet = defaultdict(list)
+        for token_balance in token_balances.order_by('wallet_id', '-usd_value', 'token_id'):
+            fetched_counts[token_balance.wallet_id] += 1
+            if keep(token_balance):
+                balances_by_wallet[token_balance.wallet_id].append(token_balance)
+
+        wallets_data = []
+        for user_wallet in user_wallets:
+            rows = balances_by_wallet[user_wallet.wallet_id]
+            next_cursor = None
+
+            if page_size and len(rows) > page_size:
+                rows = rows[:page_size]
+                next_cursor = encode_cursor(rows[-1].usd_value, rows[-1].token_id)
+            elif page_size and fetched_counts[user_wallet.wallet_id] > page_size:
+                # Unpriced tokens took page space, scan this wallet further
+                rows, next_cursor = paginate_by_usd_value(wallet_balances([user_wallet.wallet_id]), page_size, keep=keep)
+
+            wallets_data.append(self._wallet_assets_data(user_wallet, rows, next_cursor, prices))
+
+        return wallets_data
+
+    def _wallet_assets_data(self, user_wallet, token_balances, next_cursor, prices):
+        """
+        Format a page of wallet token balances in the response format
+        
+        Args:
+            user_wallet: UserWallet instance with wallet selected
+            token_balances: WalletTokenBalance rows of the page
+            next_cursor: Cursor of the next page, or None
+            prices: PriceSnapshot to read token prices from
             
-            return {
-                "wallet_name": user_wallet.name,
-                "wallet_address": wallet.address,
-                "wallet_chain": wallet.chain,
-                "tokens": tokens_data
+        Returns:
+            dict: Wallet data with its tokens and the next cursor
+        """
+        tokens_data = []
+        
+        for token_balance in token_balances:
+            token_data = {
+                "token_details": {
+                    "address": token_balance.token.contract_address,
+                    "chain": token_balance.token.chain,
+                    "symbol": token_balance.token.master.symbol,
+                    "name": token_balance.token.master.name,
+                    "logo": token_balance.token.master.image,
+                    "price_usd": prices.get_price(token_balance.token_id),
+                    "percentage_24h": str(prices.get_percentage_24h(token_balance.token_id)),
+                },
+                "token_balance": {
+                    "token_balance_formatted": (token_balance.raw_balance, token_balance.decimals),
+                    "usd_value": token_balance.usd_value
+                }
             }
             
-        except UserWallet.DoesNotExist:
-            raise ValueError("Wallet not found or doesn't belong to user")
+            tokens_data.append(token_data)
+        
+        wallet = user_wallet.wallet
+        return {
+            "wallet_name": user_wallet.name,
+            "wallet_address": wallet.address,
+            "wallet_chain": wallet.chain,
+            "tokens": tokens_data,
+            "next_cursor": next_cursor
+        }
 
-    def get_user_aggregated_portfolio(self, user):
+    def get_user_aggregated_portfolio(self, user, min_usd=None, chain=None, search=None, page_size=None, cursor=None):
         """
         Get aggregated portfolio across all user wallets
         
+        Reads the maintained per-(user, token) valuations, already summed
+        across wallets and indexed by USD value, filtering and paginating in
+        the database. Prices come from the process-wide PriceSnapshot and
+        tokens without a CoinGecko price are left out.
+        
         Args:
             user: User instance
+            min_usd: Optional minimum USD value per token
+            chain: Optional chain name (frontend variant)
+            search: Optional symbol or name fragment
+            page_size: Optional number of top holdings per page
+            cursor: Optional cursor returned with the previous page
             
         Returns:
-            dict: Aggregated portfolio with tokens list, sorted by USD value
+            dict: Aggregated portfolio with total USD value, a page of tokens sorted by USD value and the next cursor
         """
         try:
-            # Get all user wallets
-            user_wallets = UserWallet.objects.select_related('wallet').filter(user=user)
+            prices = PriceSnapshot.current()
+            token_valuations = filter_tokens(
+                UserTokenValuation.objects.filter(
+                    user=user
+                ).select_related(
+                    'token__master'
+                ).only(*TOKEN_ROW_FIELDS),
+                min_usd=min_usd,
+                chain=FRONTEND_TO_COINGECKO_MAPPING[chain] if chain else None,
+                search=search
+            )
+            token_valuations, next_cursor = paginate_by_usd_value(
+                token_valuations, page_size, cursor, keep=lambda row: row.token_id in prices
+            )
+            
+            aggregated_tokens = [self._aggregated_token_data(valuation, prices) for valuation in token_valuations]
             
             # Check if user has any wallets
-            if not user_wallets.exists():
+            if not aggregated_tokens and not cursor and not UserWallet.objects.filter(user=user).exists():
                 return {
                     "message": "User has no wallets",
                     "tokens": []
                 }
             
-            # Extract wallet instances
-            wallet_instances = [uw.wallet for uw in user_wallets]
-            
-            # Get all token balances across all wallets
-            all_token_balances = WalletTokenBalance.objects.filter(
-                wallet__in=wallet_instances
-            ).select_related(
-                'token__master__coingecko_price'
-            )
-            
-            # Aggregate tokens by (contract_address, chain)
-            aggregated_tokens = self._aggregate_token_balances(all_token_balances)
-            
-            # Sort by USD value (highest first)
-            aggregated_tokens.sort(
-                key=lambda token: Decimal(token['token_balance']['usd_value']), 
-                reverse=True
-            )
+            total_usd = UserValuation.objects.filter(user=user).values_list('total_usd', flat=True).first()
             
             return {
-                "tokens": aggregated_tokens
+                "total_usd": total_usd or 0,
+                "tokens": aggregated_tokens,
+                "next_cursor": next_cursor
             }
             
         except Exception as e:
@@ -222,70 +313,31 @@ class PortfolioService:
                 "tokens": []
             }
 
-    def _aggregate_token_balances(self, token_balances):
+    def _aggregated_token_data(self, token_valuation, prices):
         """
-        Aggregate token balances by (contract_address, chain)
-        Handles partial failures gracefully
+        Format a user token valuation in the response format
         
         Args:
-            token_balances: QuerySet of WalletTokenBalance instances
+            token_valuation: UserTokenValuation instance
+            prices: PriceSnapshot to read the token's price from
             
         Returns:
-            list: Aggregated token data
+            dict: Token details and summed balance
         """
-        # Dictionary to group tokens: key = (contract_address, chain)
-        token_groups = {}
-        
-        for token_balance in token_balances:
-            try:
-                # Create unique key for this token
-                key = (
-                    token_balance.token.contract_address,
-                    token_balance.token.chain
-                )
-                
-                # Calculate USD value (might fail for tokens without prices)
-                usd_value = self.calculate_token_balance_usd(token_balance)
-                
-                if key not in token_groups:
-                     # Extract price object once
-                    price_obj = token_balance.token.master.coingecko_price
-                    frontend_chain = COINGECKO_TO_FRONTEND_MAPPING[token_balance.token.chain]
+        token = token_valuation.token
 
-                    # First time seeing this token
-                    token_groups[key] = {
-                        'token_balance_sum': token_balance.balance,
-                        'usd_value_sum': usd_value,
-                        'token_details': {
-                            "address": token_balance.token.contract_address,
-                            "chain": frontend_chain,
-                            "symbol": token_balance.token.master.symbol,
-                            "name": token_balance.token.master.name,
-                            "logo": token_balance.token.master.image,
-                            "price_usd": str(price_obj.price_usd),
-                            "percentage_24h": str(price_obj.percentage_24h),
-                        }
-                    }
-                else:
-                    # Add to existing token
-                    token_groups[key]['token_balance_sum'] += token_balance.balance
-                    token_groups[key]['usd_value_sum'] += usd_value
-                    
-            except Exception as e:
-                # Log the error but continue processing other tokens
-                print(f"Error processing token {token_balance.token}: {e}")
-                continue
-        
-        # Convert to the response format
-        aggregated_tokens = []
-        for token_data in token_groups.values():
-            aggregated_token = {
-                "token_details": token_data['token_details'],
-                "token_balance": {
-                    "token_balance_formatted": str(token_data['token_balance_sum']),
-                    "usd_value": str(token_data['usd_value_sum'])
-                }
+        return {
+            "token_details": {
+                "address": token.contract_address,
+                "chain": COINGECKO_TO_FRONTEND_MAPPING[token.chain],
+                "symbol": token.master.symbol,
+                "name": token.master.name,
+                "logo": token.master.image,
+                "price_usd": prices.get_price(token.pk),
+                "percentage_24h": str(prices.get_percentage_24h(token.pk)),
+            },
+            "token_balance": {
+                "token_balance_formatted": (token_valuation.raw_balance, token_valuation.decimals),
+                "usd_value": token_valuation.usd_value
             }
-            aggregated_tokens.append(aggregated_token)
-        
-        return aggregated_tokens
+        }
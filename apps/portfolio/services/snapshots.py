@@ -0,0 +1,133 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from ..models import UserValuation, WalletValuation, UserValueSnapshot, WalletValueSnapshot
+from apps.integrations.coingecko.streaming import iter_batches
+from apps.wallets.models import UserWallet
+from config.chain_mapping import FRONTEND_TO_COINGECKO_MAPPING
+
+# Rows per INSERT ... ON CONFLICT statement
+SNAPSHOT_BATCH_SIZE = 1000
+
+# Week day kept when downsampling (Django week_day: 1 = Sunday, 2 = Monday)
+DOWNSAMPLE_WEEK_DAY = 2
+
+
+class SnapshotService:
+    """
+    Records and serves daily portfolio value history
+
+    Snapshots are copied in bulk from the maintained valuation tables, so
+    taking one costs a scan of those tables rather than a query per user.
+    Points older than SNAPSHOT_DAILY_RETENTION_DAYS can be downsampled to
+    one per week.
+    """
+
+    def take_snapshot(self, date=None):
+        """
+        Record today's USD totals of every user and watched wallet
+
+        Running it again on the same day overwrites that day's points.
+
+        Args:
+            date: Snapshot date (defaults to today)
+
+        Returns:
+            dict: Number of user and wallet points written
+        """
+        date = date or timezone.localdate()
+
+        user_totals = UserValuation.objects.values_list('user_id', 'total_usd')
+        wallet_totals = WalletValuation.objects.filter(
+            Exists(UserWallet.objects.filter(wallet_id=OuterRef('wallet_id')))
+        ).values_list('wallet_id', 'total_usd')
+
+        with transaction.atomic():
+            user_count = self._write_points(
+                UserValueSnapshot,
+                (UserValueSnapshot(user_id=user_id, date=date, total_usd=total) for user_id, total in user_totals.iterator()),
+                unique_fields=['user', 'date'],
+            )
+            wallet_count = self._write_points(
+                WalletValueSnapshot,
+                (WalletValueSnapshot(wallet_id=wallet_id, date=date, total_usd=total) for wallet_id, total in wallet_totals.iterator()),
+                unique_fields=['wallet', 'date'],
+            )
+
+        return {"users": user_count, "wallets": wallet_count}
+
+    def downsample(self, today=None):
+        """
+        Keep one point per week for snapshots older than the retention window
+
+        Returns:
+            int: Number of points deleted (0 when downsampling is disabled)
+        """
+        retention_days = getattr(settings, "SNAPSHOT_DAILY_RETENTION_DAYS", 90)
+        if not retention_days:
+            return 0
+
+        cutoff = (today or timezone.localdate()) - timedelta(days=retention_days)
+
+        deleted_count = 0
+        for model in (UserValueSnapshot, WalletValueSnapshot):
+            count, _ = model.objects.filter(date__lt=cutoff).exclude(date__week_day=DOWNSAMPLE_WEEK_DAY).delete()
+            deleted_count += count
+
+        return deleted_count
+
+    def get_user_history(self, user, days):
+        """
+        Get a user's portfolio value points for the last `days` days
+
+        Returns:
+            list: Dicts with date and total_usd, oldest first
+        """
+        return self._history(UserValueSnapshot.objects.filter(user=user), days)
+
+    def get_wallet_history(self, user, address, chain, days):
+        """
+        Get a wallet's value points for the last `days` days
+
+        Args:
+            user: User instance (must watch the wallet)
+            address: Wallet address string
+            chain: Chain name string (frontend variant)
+            days: Number of days back from today
+
+        Raises:
+            ValueError: If wallet not found or doesn't belong to user
+        """
+        try:
+            user_wallet = UserWallet.objects.get(
+                user=user,
+                wallet__address=address,
+                wallet__chain=FRONTEND_TO_COINGECKO_MAPPING[chain]
+            )
+        except UserWallet.DoesNotExist:
+            raise ValueError("Wallet not found or doesn't belong to user")
+
+        return self._history(WalletValueSnapshot.objects.filter(wallet_id=user_wallet.wallet_id), days)
+
+    def _history(self, snapshots, days):
+        start = timezone.localdate() - timedelta(days=days)
+        return [
+            {"date": date.isoformat(), "total_usd": total}
+            for date, total in snapshots.filter(date__gte=start).order_by('date').values_list('date', 'total_usd')
+        ]
+
+    def _write_points(self, model, points, unique_fields):
+        """Upsert snapshot points in batches without materializing them all"""
+        count = 0
+        for batch in iter_batches(points, SNAPSHOT_BATCH_SIZE):
+            model.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=['total_usd'],
+            )
+            count += len(batch)
+
+        return count
@@ -0,0 +1,277 @@
+from django.db import transaction
+from django.db.models import Sum
+from ..fixed_point import clamp_usd, usd_units
+from ..models import WalletTokenBalance, WalletValuation, UserValuation, UserTokenValuation
+from apps.integrations.coingecko.streaming import iter_batches
+from apps.prices.services.service import PriceSnapshot
+from apps.wallets.models import Wallet, UserWallet
+
+# Wallets / users refreshed per round of grouped queries
+VALUATION_BATCH_SIZE = 1000
+
+
+class ValuationService:
+    """
+    Maintains the materialized valuation tables
+
+    WalletTokenBalance.usd_value, WalletValuation, UserTokenValuation and
+    UserValuation hold what portfolio reads used to compute on every request. They are refreshed incrementally,
+    only for the wallets and users affected by a balance write, a removed
+    wallet or a price change, and can be rebuilt from scratch with the
+    rebuild_valuations management command.
+
+    Values are computed with exact integer arithmetic from raw balances and
+    fixed-point prices (see fixed_point); SQL only sums integer columns.
+    """
+
+    def refresh_wallets(self, wallet_ids):
+        """
+        Recompute valuations after balances of some wallets changed
+
+        Args:
+            wallet_ids: Ids of wallets whose balances were written
+
+        Returns:
+            dict: wallet_id -> new total USD value
+        """
+        wallet_ids = set(wallet_ids)
+        totals = self.revalue_wallets(wallet_ids)
+
+        self.refresh_users(
+            UserWallet.objects.filter(wallet_id__in=wallet_ids).values_list('user_id', flat=True)
+        )
+        return totals
+
+    def revalue_wallets(self, wallet_ids):
+        """
+        Recompute balance values and totals of some wallets, but not of their users
+
+        Lets wallet syncs rebuild each affected user once with refresh_users,
+        however many of the user's wallets changed.
+
+        Args:
+            wallet_ids: Ids of wallets whose balances were written
+
+        Returns:
+            dict: wallet_id -> new total USD value
+        """
+        totals = {}
+
+        for batch in iter_batches(set(wallet_ids), VALUATION_BATCH_SIZE):
+            with transaction.atomic():
+                self._write_balance_values(WalletTokenBalance.objects.filter(wallet_id__in=batch))
+                totals.update(self._write_wallet_totals(batch))
+
+        return totals
+
+    def refresh_users(self, user_ids):
+        """
+        Recompute per-token and total valuations of some users
+
+        Used when the set of wallets (or the balances) of a user changed.
+
+        Args:
+            user_ids: Ids of affected users
+        """
+        for batch in iter_batches(set(user_ids), VALUATION_BATCH_SIZE):
+            with transaction.atomic():
+                UserTokenValuation.objects.filter(user_id__in=batch).delete()
+                self._write_user_tokens(
+                    WalletTokenBalance.objects.filter(wallet__userwallet__user_id__in=batch)
+                )
+                self._write_user_totals(batch)
+
+    def refresh_prices(self, token_master_ids):
+        """
+        Recompute valuations after CoinGecko prices of some tokens changed
+
+        Args:
+            token_master_ids: Ids of TokenMasters whose price changed
+
+        Returns:
+            int: Number of wallets revalued
+        """
+        token_master_ids = set(token_master_ids)
+        if not token_master_ids:
+            return 0
+
+        wallet_ids = set(
+            WalletTokenBalance.objects.filter(
+                token__master_id__in=token_master_ids
+            ).values_list('wallet_id', flat=True).distinct()
+        )
+
+        for batch in iter_batches(wallet_ids, VALUATION_BATCH_SIZE):
+            with transaction.atomic():
+                # Values and totals are written together so a concurrent sync
+                # cannot change raw balances between the two
+                self._write_balance_values(
+                    WalletTokenBalance.objects.filter(wallet_id__in=batch, token__master_id__in=token_master_ids)
+                )
+                self._write_wallet_totals(batch)
+
+        user_ids = set(
+            UserWallet.objects.filter(
+                wallet__wallettokenbalance__token__master_id__in=token_master_ids
+            ).values_list('user_id', flat=True).distinct()
+        )
+
+        for batch in iter_batches(user_ids, VALUATION_BATCH_SIZE):
+            with transaction.atomic():
+                # Holdings did not change, only revalue the affected (user, token) rows
+                self._write_user_tokens(
+                    WalletTokenBalance.objects.filter(
+                        wallet__userwallet__user_id__in=batch,
+                        token__master_id__in=token_master_ids
+                    )
+                )
+                self._write_user_totals(batch)
+
+        return len(wallet_ids)
+
+    def rebuild(self):
+        """
+        Rebuild every valuation table from balances and prices
+
+        Returns:
+            dict: Number of wallets and users valued
+        """
+        with transaction.atomic():
+            UserTokenValuation.objects.all().delete()
+            UserValuation.objects.all().delete()
+            WalletValuation.objects.all().delete()
+
+            self._write_balance_values(WalletTokenBalance.objects.all())
+
+            wallet_ids = list(Wallet.objects.values_list('pk', flat=True))
+            for batch in iter_batches(wallet_ids, VALUATION_BATCH_SIZE):
+                self._write_wallet_totals(batch)
+
+            user_ids = list(UserWallet.objects.values_list('user_id', flat=True).distinct())
+            for batch in iter_batches(user_ids, VALUATION_BATCH_SIZE):
+                self._write_user_tokens(
+                    WalletTokenBalance.objects.filter(wallet__userwallet__user_id__in=batch)
+                )
+                self._write_user_totals(batch)
+
+        # Every user's values may have changed
+        PriceSnapshot.publish()
+        return {"wallets": len(wallet_ids), "users": len(user_ids)}
+
+    def _write_balance_values(self, token_balances):
+        """
+        Set usd_value of the given balances from current prices, 0 when unpriced
+
+        Must run inside a transaction: the balance rows are locked until it
+        commits, so a sync cannot overwrite raw_balance between the read and
+        the usd_value write and be left with a value computed from the old one.
+        """
+        rows = token_balances.select_for_update(of=('self',)).values_list(
+            'id', 'raw_balance', 'decimals', 'usd_value',
+            'token__master__coingecko_price__price_mantissa',
+            'token__master__coingecko_price__price_exponent',
+        ).order_by('pk')  # Lock rows in a stable order to avoid deadlocks between refreshes
+
+        changed = []
+        for balance_id, raw_balance, decimals, usd_value, price_mantissa, price_exponent in rows.iterator(chunk_size=VALUATION_BATCH_SIZE):
+            if price_mantissa is None:
+                value = 0
+            else:
+                value = usd_units(raw_balance, decimals, price_mantissa, price_exponent)
+
+            if value != usd_value:
+                changed.append(WalletTokenBalance(id=balance_id, usd_value=value))
+
+        WalletTokenBalance.objects.bulk_update(changed, ['usd_value'], batch_size=VALUATION_BATCH_SIZE)
+
+    def _write_wallet_totals(self, wallet_ids):
+        """Upsert WalletValuation rows, wallets without priced balances are worth 0"""
+        totals = dict(
+            WalletTokenBalance.objects.filter(
+                wallet_id__in=wallet_ids
+            ).values('wallet_id').annotate(total=Sum('usd_value')).values_list('wallet_id', 'total')
+        )
+        totals = {wallet_id: clamp_usd(int(totals.get(wallet_id) or 0)) for wallet_id in wallet_ids}
+
+        WalletValuation.objects.bulk_create(
+            [WalletValuation(wallet_id=wallet_id, total_usd=total) for wallet_id, total in totals.items()],
+            batch_size=VALUATION_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['wallet'],
+            update_fields=['total_usd', 'updated_at'],
+        )
+        return totals
+
+    def _write_user_tokens(self, token_balances):
+        """
+        Upsert UserTokenValuation rows aggregated from the given balances
+
+        Raw balances of a token are summed per number of decimals, then
+        rescaled to the largest one, so the sum stays exact.
+
+        Args:
+            token_balances: WalletTokenBalance queryset filtered by
+                wallet__userwallet__user, so every holding of an affected
+                (user, token) pair is included
+        """
+        rows = token_balances.values(
+            'wallet__userwallet__user_id', 'token_id', 'decimals'
+        ).annotate(
+            raw_balance_sum=Sum('raw_balance'),
+            usd_value_sum=Sum('usd_value')
+        ).order_by()
+
+        # (user_id, token_id) -> [raw_balance, decimals, usd_value]
+        holdings = {}
+        for row in rows:
+            key = (row['wallet__userwallet__user_id'], row['token_id'])
+            raw_balance, decimals = int(row['raw_balance_sum']), row['decimals']
+
+            if key in holdings:
+                held_raw, held_decimals, held_usd = holdings[key]
+                if decimals > held_decimals:
+                    held_raw *= 10 ** (decimals - held_decimals)
+                    held_decimals = decimals
+                else:
+                    raw_balance *= 10 ** (held_decimals - decimals)
+                holdings[key] = [held_raw + raw_balance, held_decimals, held_usd + int(row['usd_value_sum'])]
+            else:
+                holdings[key] = [raw_balance, decimals, int(row['usd_value_sum'])]
+
+        valuations = [
+            UserTokenValuation(
+                user_id=user_id,
+                token_id=token_id,
+                raw_balance=raw_balance,
+                decimals=decimals,
+                usd_value=clamp_usd(usd_value),
+            )
+            for (user_id, token_id), (raw_balance, decimals, usd_value) in holdings.items()
+        ]
+
+        UserTokenValuation.objects.bulk_create(
+            valuations,
+            batch_size=VALUATION_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'token'],
+            update_fields=['raw_balance', 'decimals', 'usd_value', 'updated_at'],
+        )
+
+    def _write_user_totals(self, user_ids):
+        """Upsert UserValuation rows as the sum of the users' token valuations"""
+        totals = dict(
+            UserTokenValuation.objects.filter(
+                user_id__in=user_ids
+            ).values('user_id').annotate(total=Sum('usd_value')).values_list('user_id', 'total')
+        )
+
+        UserValuation.objects.bulk_create(
+            [
+                UserValuation(user_id=user_id, total_usd=clamp_usd(int(totals.get(user_id) or 0)))
+                for user_id in user_ids
+            ],
+            batch_size=VALUATION_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['total_usd', 'updated_at'],
+        )
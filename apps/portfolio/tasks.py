@@ -0,0 +1,15 @@
+from celery import shared_task
+from .services.snapshots import SnapshotService
+
+@shared_task
+def take_portfolio_snapshots_task():
+    """Record daily user and wallet USD totals, then downsample old points"""
+    try:
+        service = SnapshotService()
+        counts = service.take_snapshot()
+        deleted_count = service.downsample()
+        return f"Snapshot: {counts['users']} users, {counts['wallets']} wallets. Downsampled {deleted_count} old points"
+
+    except Exception as e:
+        print(f"Portfolio snapshot failed: {e}")
+        raise
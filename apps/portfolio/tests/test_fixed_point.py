@@ -0,0 +1,156 @@
+from decimal import Decimal
+from django.test import SimpleTestCase, TestCase
+from apps.portfolio.fixed_point import (
+    MAX_USD_UNITS,
+    PRICE_DIGITS,
+    clamp_usd,
+    decimal_to_usd_units,
+    format_fixed,
+    format_price,
+    format_usd,
+    price_to_fixed,
+    usd_units,
+    usd_units_to_decimal,
+)
+from apps.portfolio.models import UserTokenValuation, WalletTokenBalance, WalletValuation
+from apps.portfolio.services.valuation import ValuationService
+from apps.prices.models import CoingeckoPrice
+from apps.tokens.models import Token, TokenMaster
+from apps.users.models import CustomUser
+from apps.wallets.models import UserWallet, Wallet
+
+
+class PriceToFixedTests(SimpleTestCase):
+    def test_splits_into_mantissa_and_exponent(self):
+        self.assertEqual(price_to_fixed(Decimal('1.5')), (15, -1))
+        self.assertEqual(price_to_fixed(Decimal('2500')), (25, 2))
+        self.assertEqual(price_to_fixed(Decimal('0.00001234')), (1234, -8))
+
+    def test_zero(self):
+        self.assertEqual(price_to_fixed(0), (0, 0))
+        self.assertEqual(price_to_fixed(Decimal('0.000')), (0, 0))
+
+    def test_float_uses_its_shortest_repr(self):
+        self.assertEqual(price_to_fixed(0.1), (1, -1))
+
+    def test_negative(self):
+        self.assertEqual(price_to_fixed(Decimal('-0.25')), (-25, -2))
+
+    def test_rounds_to_price_digits(self):
+        mantissa, exponent = price_to_fixed(Decimal('1.2345678901234567895'))
+        self.assertEqual(len(str(mantissa)), PRICE_DIGITS)
+        self.assertEqual((mantissa, exponent), (123456789012345679, -17))
+
+    def test_round_trip(self):
+        for price in ('1', '0.5', '123.456', '0.000000001234', '98765432109876543.2', '1E+30'):
+            with self.subTest(price=price):
+                formatted = format_price(*price_to_fixed(Decimal(price)))
+                self.assertEqual(Decimal(formatted), Decimal(price))
+
+    def test_rejects_non_finite(self):
+        for price in (Decimal('NaN'), Decimal('Infinity'), float('inf')):
+            with self.subTest(price=price):
+                with self.assertRaises(ValueError):
+                    price_to_fixed(price)
+
+
+class UsdUnitsTests(SimpleTestCase):
+    def test_values_raw_balance(self):
+        # 1.5 tokens with 18 decimals at $2000
+        self.assertEqual(usd_units(15 * 10 ** 17, 18, 2, 3), 3000 * 10 ** 6)
+        # 5 USDC (6 decimals) at $1
+        self.assertEqual(usd_units(5 * 10 ** 6, 6, 1, 0), 5 * 10 ** 6)
+
+    def test_rounds_down(self):
+        # $0.0000019 is 1.9 units
+        self.assertEqual(usd_units(19, 0, 1, -7), 1)
+        # 1 wei at $2000 is far below one unit
+        self.assertEqual(usd_units(1, 18, 2, 3), 0)
+
+    def test_zero_price(self):
+        self.assertEqual(usd_units(10 ** 30, 18, 0, 0), 0)
+
+    def test_clamps_to_max(self):
+        self.assertEqual(usd_units(10 ** 77, 0, 10 ** 17, 10), MAX_USD_UNITS)
+        self.assertEqual(usd_units(10 ** 77, 0, -10 ** 17, 10), -MAX_USD_UNITS)
+
+    def test_clamp_usd(self):
+        self.assertEqual(clamp_usd(5), 5)
+        self.assertEqual(clamp_usd(MAX_USD_UNITS + 1), MAX_USD_UNITS)
+        self.assertEqual(clamp_usd(-MAX_USD_UNITS - 1), -MAX_USD_UNITS)
+
+
+class DecimalConversionTests(SimpleTestCase):
+    def test_decimal_to_usd_units_rounds_up(self):
+        self.assertEqual(decimal_to_usd_units(Decimal('1.5')), 1500000)
+        self.assertEqual(decimal_to_usd_units(Decimal('0.0000001')), 1)
+        self.assertEqual(decimal_to_usd_units(Decimal('-0.0000019')), -1)
+        self.assertEqual(decimal_to_usd_units('0'), 0)
+
+    def test_usd_units_to_decimal(self):
+        self.assertEqual(usd_units_to_decimal(1500000), Decimal('1.5'))
+        self.assertEqual(usd_units_to_decimal(-1), Decimal('-0.000001'))
+
+
+class FormatTests(SimpleTestCase):
+    def test_format_fixed(self):
+        self.assertEqual(format_fixed(1500000, 6), '1.500000')
+        self.assertEqual(format_fixed(-5, 2), '-0.05')
+        self.assertEqual(format_fixed(5, 0), '5')
+        self.assertEqual(format_fixed(5, -2), '500')
+        self.assertEqual(format_fixed(10 ** 30, 18), '1000000000000.000000000000000000')
+
+    def test_format_usd(self):
+        self.assertEqual(format_usd(0), '0.000000')
+        self.assertEqual(format_usd(MAX_USD_UNITS), '1000000000000.000000')
+
+    def test_format_price(self):
+        self.assertEqual(format_price(15, -1), '1.5')
+        self.assertEqual(format_price(25, 2), '2500')
+
+
+class ValuationArithmeticTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='holder@example.com', password='password')
+        self.wallets = [
+            Wallet.objects.create(address='0xa', chain='ethereum'),
+            Wallet.objects.create(address='0xb', chain='ethereum'),
+        ]
+        for wallet in self.wallets:
+            UserWallet.objects.create(user=self.user, wallet=wallet)
+
+        master = TokenMaster.objects.create(coingecko_id='usd-coin', symbol='USDC', name='USD Coin')
+        CoingeckoPrice.objects.create(token_master=master, price_mantissa=1, price_exponent=0)
+        self.token = Token.objects.create(master=master, chain='ethereum', contract_address='0xusdc')
+
+        unpriced = TokenMaster.objects.create(coingecko_id='unpriced', symbol='UNP', name='Unpriced')
+        self.unpriced_token = Token.objects.create(master=unpriced, chain='ethereum', contract_address='0xunp')
+
+    def test_mixed_decimals_are_rescaled_to_the_largest(self):
+        # 1.5 of the token reported with 6 decimals in one wallet and 18 in the other
+        WalletTokenBalance.objects.create(wallet=self.wallets[0], token=self.token, raw_balance=1500000, decimals=6)
+        WalletTokenBalance.objects.create(wallet=self.wallets[1], token=self.token, raw_balance=25 * 10 ** 17, decimals=18)
+
+        ValuationService().refresh_wallets([wallet.pk for wallet in self.wallets])
+
+        valuation = UserTokenValuation.objects.get(user=self.user, token=self.token)
+        self.assertEqual(valuation.decimals, 18)
+        self.assertEqual(int(valuation.raw_balance), 4 * 10 ** 18)
+        self.assertEqual(valuation.usd_value, 4 * 10 ** 6)
+
+    def test_unpriced_token_is_worth_zero(self):
+        WalletTokenBalance.objects.create(wallet=self.wallets[0], token=self.unpriced_token, raw_balance=10 ** 20, decimals=18)
+        WalletTokenBalance.objects.create(wallet=self.wallets[0], token=self.token, raw_balance=2000000, decimals=6)
+
+        ValuationService().refresh_wallets([self.wallets[0].pk])
+
+        self.assertEqual(WalletTokenBalance.objects.get(token=self.unpriced_token).usd_value, 0)
+        self.assertEqual(WalletValuation.objects.get(wallet=self.wallets[0]).total_usd, 2 * 10 ** 6)
+
+    def test_zero_price(self):
+        CoingeckoPrice.objects.filter(token_master=self.token.master).update(price_mantissa=0, price_exponent=0)
+        WalletTokenBalance.objects.create(wallet=self.wallets[0], token=self.token, raw_balance=2000000, decimals=6)
+
+        ValuationService().refresh_wallets([self.wallets[0].pk])
+
+        self.assertEqual(WalletValuation.objects.get(wallet=self.wallets[0]).total_usd, 0)
@@ -0,0 +1,76 @@
+import base64
+from django.test import SimpleTestCase, TestCase
+from apps.portfolio.models import UserTokenValuation
+from apps.portfolio.pagination import decode_cursor, encode_cursor, paginate_by_usd_value
+from apps.tokens.models import Token, TokenMaster
+from apps.users.models import CustomUser
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        for usd_value, token_id in ((0, 1), (1500000, 42), (-7, 3), (10 ** 18, 2 ** 63 - 1)):
+            with self.subTest(usd_value=usd_value, token_id=token_id):
+                self.assertEqual(decode_cursor(encode_cursor(usd_value, token_id)), (usd_value, token_id))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor(10 ** 18, 2 ** 63 - 1)
+        self.assertRegex(cursor, r'^[A-Za-z0-9_=-]+$')
+
+    def test_rejects_malformed_cursors(self):
+        cursors = [
+            '',
+            'not a cursor',
+            'abc',
+            base64.urlsafe_b64encode(b'12').decode(),
+            base64.urlsafe_b64encode(b'1|2|3').decode(),
+            base64.urlsafe_b64encode(b'1.5|2').decode(),
+            base64.urlsafe_b64encode(b'x|2').decode(),
+            base64.urlsafe_b64encode(b'\xff\xfe|1').decode(),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                with self.assertRaisesMessage(ValueError, "Invalid cursor"):
+                    decode_cursor(cursor)
+
+
+class PaginateByUsdValueTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='holder@example.com', password='password')
+        # Two rows share a value so the token id breaks the tie
+        for symbol, usd_value in (('A', 500), ('B', 300), ('C', 300), ('D', 100), ('E', 0)):
+            master = TokenMaster.objects.create(coingecko_id=symbol.lower(), symbol=symbol, name=symbol)
+            token = Token.objects.create(master=master, chain='ethereum', contract_address=f'0x{symbol}')
+            UserTokenValuation.objects.create(user=user, token=token, raw_balance=1, decimals=0, usd_value=usd_value)
+        self.queryset = UserTokenValuation.objects.filter(user=user).select_related('token__master')
+
+    def symbols(self, rows):
+        return [row.token.master.symbol for row in rows]
+
+    def test_walks_every_page_once(self):
+        seen = []
+        cursor = None
+        while True:
+            rows, cursor = paginate_by_usd_value(self.queryset, page_size=2, cursor=cursor)
+            seen.extend(self.symbols(rows))
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['A', 'B', 'C', 'D', 'E'])
+
+    def test_last_full_page_has_no_cursor(self):
+        rows, cursor = paginate_by_usd_value(self.queryset, page_size=5)
+        self.assertEqual(len(rows), 5)
+        self.assertIsNone(cursor)
+
+    def test_without_page_size_returns_every_row(self):
+        rows, cursor = paginate_by_usd_value(self.queryset)
+        self.assertEqual(self.symbols(rows), ['A', 'B', 'C', 'D', 'E'])
+        self.assertIsNone(cursor)
+
+    def test_keep_skips_rows_and_fills_the_page(self):
+        keep = lambda row: row.token.master.symbol not in ('B', 'C')
+        rows, cursor = paginate_by_usd_value(self.queryset, page_size=2, keep=keep)
+        self.assertEqual(self.symbols(rows), ['A', 'D'])
+
+        rows, cursor = paginate_by_usd_value(self.queryset, page_size=2, cursor=cursor, keep=keep)
+        self.assertEqual(self.symbols(rows), ['E'])
+        self.assertIsNone(cursor)
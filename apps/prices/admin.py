@@ -1,4 +1,5 @@
 from django.contrib import admin
+from apps.portfolio.fixed_point import format_price
 from .models import CoingeckoPrice
 
 @admin.register(CoingeckoPrice)
@@ -9,3 +10,7 @@ class CoingeckoPriceAdmin(admin.ModelAdmin):
     list_display = ('token_master__name', 'price_usd', 'percentage_24h', 'updated_at')
     search_fields = ('token_master__name', 'token_master__symbol')
 
+    @admin.display(description='Price USD')
+    def price_usd(self, obj):
+        return format_price(obj.price_mantissa, obj.price_exponent)
+
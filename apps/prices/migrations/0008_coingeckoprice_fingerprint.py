@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prices', '0007_coingeckoprice_percentage_24h'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coingeckoprice',
+            name='fingerprint',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from decimal import Context
+
+from django.db import migrations, models
+
+# Keep in sync with apps.portfolio.fixed_point.PRICE_DIGITS
+PRICE_DIGITS = 18
+
+
+def split_prices(apps, schema_editor):
+    """Convert price_usd into price_mantissa and price_exponent"""
+    CoingeckoPrice = apps.get_model('prices', 'CoingeckoPrice')
+    context = Context(prec=PRICE_DIGITS)
+
+    prices = []
+    for price in CoingeckoPrice.objects.only('id', 'price_usd').iterator():
+        value = context.create_decimal(price.price_usd).normalize(context)
+        if value:
+            sign, digits, exponent = value.as_tuple()
+            mantissa = int(''.join(map(str, digits)))
+            price.price_mantissa = -mantissa if sign else mantissa
+            price.price_exponent = exponent
+            prices.append(price)
+
+    CoingeckoPrice.objects.bulk_update(prices, ['price_mantissa', 'price_exponent'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prices', '0008_coingeckoprice_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coingeckoprice',
+            name='price_mantissa',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='coingeckoprice',
+            name='price_exponent',
+            field=models.SmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(split_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prices', '0009_coingeckoprice_price_mantissa'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='coingeckoprice',
+            name='price_usd',
+        ),
+    ]
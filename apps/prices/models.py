@@ -10,10 +10,15 @@ class CoingeckoPrice(models.Model):
             on_delete=models.CASCADE,
             related_name='coingecko_price'
             )
-    price_usd = models.DecimalField(max_digits=70, decimal_places=50)
+    # USD price = price_mantissa * 10 ** price_exponent
+    price_mantissa = models.BigIntegerField()
+    price_exponent = models.SmallIntegerField()
     updated_at = models.DateTimeField(auto_now=True)
     percentage_24h = models.DecimalField(max_digits=10, decimal_places=5, null=True, blank=True)
 
+    # Hash of the synced price fields, used to skip unchanged rows
+    fingerprint = models.BigIntegerField(null=True, blank=True)
+
     def __str__(self):
         return f"CoinGecko price of {self.token_master.symbol} ({self.token_master.name})"
 
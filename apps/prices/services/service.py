@@ -0,0 +1,250 @@
+import threading
+import time
+from array import array
+from decimal import Decimal
+from django.core.cache import cache
+from apps.portfolio.cache import bump_price_version, get_price_version, new_price_version
+from apps.portfolio.models import WalletTokenBalance
+from apps.tokens.models import Token
+
+HELD_IDS_CACHE_KEY = "prices:held_coingecko_ids"
+HELD_IDS_GENERATION_KEY = "prices:held_coingecko_ids:generation"
+SNAPSHOT_CACHE_KEY = "prices:snapshot:{version}"
+SNAPSHOT_BUILD_LOCK_KEY = "prices:snapshot_build:{version}"
+
+# Stored percentage_24h is DecimalField(10, 5), kept as an integer of 10 ** -5
+PERCENTAGE_DECIMALS = 5
+
+# percentage_24h slot value of prices without a 24h change
+NO_PERCENTAGE = -2 ** 63
+
+# Published snapshots are only read until the next price version
+SNAPSHOT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Longest a worker may take to build a missing snapshot for the others
+SNAPSHOT_BUILD_LOCK_TIMEOUT = 60
+
+# Full recompute interval (also picks up removals); additions force an earlier recompute
+HELD_IDS_RECOMPUTE_SECONDS = 60 * 60
+
+
+class HeldTokenService:
+    """Tracks the set of CoinGecko ids referenced by any WalletTokenBalance"""
+
+    def get_held_coingecko_ids(self):
+        """
+        Get the cached set of held CoinGecko ids, recomputing it when expired
+
+        Returns:
+            set: CoinGecko ids of tokens held in at least one wallet
+        """
+        values = cache.get_many([HELD_IDS_CACHE_KEY, HELD_IDS_GENERATION_KEY])
+        cached = values.get(HELD_IDS_CACHE_KEY)
+        generation = values.get(HELD_IDS_GENERATION_KEY, 0)
+
+        if (
+            cached is None
+            or cached.get('generation') != generation
+            or time.time() - cached['computed_at'] > HELD_IDS_RECOMPUTE_SECONDS
+        ):
+            return self.recompute(generation)
+
+        return cached['ids']
+
+    def recompute(self, generation=None):
+        """
+        Rebuild the held set from WalletTokenBalance in a single query
+
+        Args:
+            generation: Addition counter read before the query (read here if omitted);
+                additions made during the query leave the result stale, so the
+                next read recomputes again
+
+        Returns:
+            set: CoinGecko ids of tokens held in at least one wallet
+        """
+        if generation is None:
+            generation = cache.get(HELD_IDS_GENERATION_KEY, 0)
+
+        ids = set(
+            WalletTokenBalance.objects.filter(
+                token__master__coingecko_id__isnull=False
+            ).values_list('token__master__coingecko_id', flat=True).distinct()
+        )
+
+        cache.set(
+            HELD_IDS_CACHE_KEY,
+            {'ids': ids, 'computed_at': time.time(), 'generation': generation},
+            timeout=None,
+        )
+        return ids
+
+    def add_held_tokens(self, token_ids):
+        """
+        Make the next read pick up newly held tokens
+
+        Only bumps an addition counter with an atomic incr, so concurrent
+        writers (batch threads, other workers) cannot overwrite each other's
+        additions the way a read-modify-write of the cached set would. The
+        next read sees the new counter and recomputes the set.
+
+        Args:
+            token_ids: Iterable of Token primary keys that became held
+        """
+        if not token_ids:
+            return
+
+        try:
+            cache.incr(HELD_IDS_GENERATION_KEY)
+        except ValueError:
+            # First addition, or the counter was evicted
+            if not cache.add(HELD_IDS_GENERATION_KEY, 1, timeout=None):
+                cache.incr(HELD_IDS_GENERATION_KEY)
+
+
+class PriceSnapshot:
+    """
+    Immutable token id -> CoinGecko price table of one price version
+
+    Prices are held in parallel arrays with a dense token id -> slot index,
+    so a lookup is two array reads and no database join. Each worker keeps
+    the current snapshot and swaps in a new one only when the global price
+    version changes; a request should take one snapshot and use it
+    throughout.
+
+    Whatever changes prices calls publish(), which builds the snapshot once
+    and stores it before the new version becomes visible, so workers only
+    load a published snapshot and never query prices on the request path.
+    """
+
+    __slots__ = ('version', '_slots', '_mantissas', '_exponents', '_percentages')
+
+    _lock = threading.Lock()
+    _current = None
+
+    def __init__(self, version, token_ids, mantissas, exponents, percentages):
+        """
+        Build the snapshot from parallel arrays
+
+        Args:
+            version: Price version the prices belong to
+            token_ids: array('q') of Token ids
+            mantissas: array('q') of price mantissas
+            exponents: array('h') of price exponents
+            percentages: array('q') of 24h changes in 10 ** -5 percent, or NO_PERCENTAGE
+        """
+        self.version = version
+        self._mantissas = mantissas
+        self._exponents = exponents
+        self._percentages = percentages
+
+        self._slots = array('i', [-1]) * (max(token_ids, default=-1) + 1)
+        for slot, token_id in enumerate(token_ids):
+            self._slots[token_id] = slot
+
+    @classmethod
+    def current(cls):
+        """
+        Get the snapshot of the current price version, loading it if it changed
+
+        Returns:
+            PriceSnapshot: Snapshot shared by the whole process
+        """
+        version = get_price_version()
+        snapshot = cls._current
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with cls._lock:
+            if cls._current is None or cls._current.version != version:
+                cls._current = cls._load(version)
+            return cls._current
+
+    @classmethod
+    def publish(cls):
+        """
+        Build the snapshot of the stored prices and make it the current price version
+
+        Called after prices (or the tokens they apply to) changed; also
+        invalidates every cached portfolio response.
+
+        Returns:
+            str: The new price version
+        """
+        version = new_price_version()
+        cache.set(SNAPSHOT_CACHE_KEY.format(version=version), cls._build(), timeout=SNAPSHOT_CACHE_TIMEOUT)
+        return bump_price_version(version)
+
+    @classmethod
+    def _load(cls, version):
+        """Load the snapshot published for a price version"""
+        key = SNAPSHOT_CACHE_KEY.format(version=version)
+        packed = cache.get(key)
+
+        if packed is None:
+            # Only a version created without publish() (e.g. after the cache was
+            # cleared) has no snapshot; one worker builds it for the others
+            if cache.add(SNAPSHOT_BUILD_LOCK_KEY.format(version=version), 1, timeout=SNAPSHOT_BUILD_LOCK_TIMEOUT):
+                packed = cls._build()
+                cache.set(key, packed, timeout=SNAPSHOT_CACHE_TIMEOUT)
+            elif cls._current is not None:
+                # Keep the previous prices until it is published
+                return cls._current
+            else:
+                packed = cls._build()
+
+        token_ids, mantissas, exponents, percentages = (
+            array(typecode, data) for typecode, data in zip('qqhq', packed)
+        )
+        return cls(version, token_ids, mantissas, exponents, percentages)
+
+    @staticmethod
+    def _build():
+        """Read every price in a single query and pack the arrays for the cache"""
+        token_ids, mantissas, exponents, percentages = array('q'), array('q'), array('h'), array('q')
+        for token_id, mantissa, exponent, percentage in Token.objects.filter(
+            master__coingecko_price__isnull=False
+        ).values_list(
+            'id',
+            'master__coingecko_price__price_mantissa',
+            'master__coingecko_price__price_exponent',
+            'master__coingecko_price__percentage_24h',
+        ).iterator(chunk_size=5000):
+            token_ids.append(token_id)
+            mantissas.append(mantissa)
+            exponents.append(exponent)
+            percentages.append(NO_PERCENTAGE if percentage is None else int(percentage.scaleb(PERCENTAGE_DECIMALS)))
+
+        return tuple(values.tobytes() for values in (token_ids, mantissas, exponents, percentages))
+
+    def __contains__(self, token_id):
+        return token_id < len(self._slots) and self._slots[token_id] >= 0
+
+    def __len__(self):
+        return len(self._mantissas)
+
+    def get_price(self, token_id):
+        """
+        Get the fixed-point price of a token
+
+        Returns:
+            tuple: (mantissa, exponent), or None if the token has no price
+        """
+        if token_id not in self:
+            return None
+        slot = self._slots[token_id]
+        return self._mantissas[slot], self._exponents[slot]
+
+    def get_percentage_24h(self, token_id):
+        """
+        Get the 24h price change of a token
+
+        Returns:
+            Decimal: Change in percent with 5 decimals, or None if unknown
+        """
+        if token_id not in self:
+            return None
+        percentage = self._percentages[self._slots[token_id]]
+        if percentage == NO_PERCENTAGE:
+            return None
+        return Decimal(percentage).scaleb(-PERCENTAGE_DECIMALS)
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tokens', '0005_remove_token_coinmarketcap_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokenmaster',
+            name='coingecko_fingerprint',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -18,6 +18,9 @@ class TokenMaster(models.Model):
     # Sync timestamps
     coingecko_updated_at = models.DateTimeField(null=True, blank=True)
 
+    # Hash of the synced CoinGecko fields, used to skip unchanged rows
+    coingecko_fingerprint = models.BigIntegerField(null=True, blank=True)
+
     def __str__(self):
         return f"{self.symbol} ({self.name})"
 
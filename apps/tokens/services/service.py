@@ -0,0 +1,105 @@
+import threading
+import time
+import uuid
+from django.core.cache import cache
+from ..models import SolanaTokenDecimals
+
+VERSION_CACHE_KEY = "tokens:solana_decimals:version"
+INDEX_CACHE_KEY = "tokens:solana_decimals:{version}"
+BUILD_LOCK_KEY = "tokens:solana_decimals:build_lock"
+
+# Longest a worker may take to rebuild a missing index for the others
+BUILD_LOCK_TIMEOUT = 60
+
+# How often a worker asks the cache whether the index changed
+VERSION_CHECK_SECONDS = 30
+
+
+class SolanaDecimalsIndex:
+    """
+    Process-wide mint address -> decimals map for Solana tokens
+
+    The map is published to the cache under a version id by the Jupiter
+    sync. Each worker keeps its own copy and reloads it only when the
+    published version changes, so lookups never hit the database.
+    """
+
+    _lock = threading.Lock()
+    _version = None
+    _decimals = {}
+    _checked_at = 0.0
+
+    @classmethod
+    def get_decimals(cls):
+        """
+        Get the current mint -> decimals map
+
+        Returns:
+            dict: Solana mint address -> decimals
+        """
+        if time.monotonic() - cls._checked_at > VERSION_CHECK_SECONDS:
+            cls._refresh()
+        return cls._decimals
+
+    @classmethod
+    def _refresh(cls):
+        """Reload the local copy if the published version changed"""
+        with cls._lock:
+            cls._checked_at = time.monotonic()
+
+            version = cache.get(VERSION_CACHE_KEY)
+            if version is not None and version == cls._version:
+                return
+
+            decimals = cache.get(INDEX_CACHE_KEY.format(version=version)) if version else None
+            if decimals is None:
+                # Nothing published yet (or evicted): one worker builds and publishes it
+                if cache.add(BUILD_LOCK_KEY, 1, timeout=BUILD_LOCK_TIMEOUT):
+                    try:
+                        version, decimals = cls._publish(cls._load_from_db())
+                    finally:
+                        cache.delete(BUILD_LOCK_KEY)
+                elif cls._version is not None:
+                    # Keep the local copy until the rebuild is published
+                    return
+                else:
+                    # Nothing local yet either, use an unpublished copy meanwhile
+                    version, decimals = None, cls._load_from_db()
+
+            cls._version = version
+            cls._decimals = decimals
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Rebuild the index from SolanaTokenDecimals and publish a new version
+
+        Returns:
+            int: Number of mints in the index
+        """
+        with cls._lock:
+            version, decimals = cls._publish(cls._load_from_db())
+            cls._version = version
+            cls._decimals = decimals
+            cls._checked_at = time.monotonic()
+
+        return len(decimals)
+
+    @staticmethod
+    def _load_from_db():
+        return dict(
+            SolanaTokenDecimals.objects.values_list('token__contract_address', 'decimals')
+        )
+
+    @staticmethod
+    def _publish(decimals):
+        """Store the index under a new version, switch to it and free the previous one"""
+        previous_version = cache.get(VERSION_CACHE_KEY)
+        version = uuid.uuid4().hex
+        cache.set(INDEX_CACHE_KEY.format(version=version), decimals, timeout=None)
+        cache.set(VERSION_CACHE_KEY, version, timeout=None)
+
+        # Workers still on the previous version keep their local copy until they reload
+        if previous_version:
+            cache.delete(INDEX_CACHE_KEY.format(version=previous_version))
+        return version, decimals
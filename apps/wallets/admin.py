@@ -1,12 +1,21 @@
 from django.contrib import admin
+from ..portfolio.fixed_point import format_usd
 from .models import Wallet, UserWallet
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
     """Admin configuration for Wallet model"""
-    list_display = ('address', 'chain')
+    list_display = ('address', 'chain', 'value_usd', 'change_rate', 'last_synced_at', 'next_refresh_at')
     search_fields = ('address', 'chain')
     list_filter = ('address', 'chain')
+    readonly_fields = ('last_synced_at', 'change_rate', 'value_usd', 'sync_failures', 'next_refresh_at')
+
+    @admin.display(description='USD value', ordering='valuation__total_usd')
+    def value_usd(self, obj):
+        return format_usd(getattr(getattr(obj, 'valuation', None), 'total_usd', 0))
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('valuation')
 
 
 @admin.register(UserWallet)
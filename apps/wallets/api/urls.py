@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import AddWalletView, RemoveWalletView, SupportedChainsView, UpdateWalletNameView, SyncWalletsView
+from .views import AddWalletView, RemoveWalletView, SupportedChainsView, UpdateWalletNameView, SyncWalletsView, SyncWalletsStatusView
 
 urlpatterns = [
         path('add/', AddWalletView.as_view(), name='add-wallet'),
@@ -7,4 +7,5 @@ urlpatterns = [
         path('supported-chains/', SupportedChainsView.as_view(), name='supported-chains'),
         path('update-name/', UpdateWalletNameView.as_view(), name='update-wallet-name'),
         path('sync/', SyncWalletsView.as_view(), name='sync-wallets'),
+        path('sync/<str:job_id>/', SyncWalletsStatusView.as_view(), name='sync-wallets-status'),
         ]
@@ -3,7 +3,10 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .serializers import AddWalletSerializer
+from ..models import UserWallet
 from ..services.services import WalletService
+from ..services.jobs import WalletSyncJobStore
+from ..tasks import sync_user_wallets_task
 from drf_spectacular.utils import extend_schema
 from config.chain_mapping import NETWORK_MAPPING
 
@@ -271,52 +274,113 @@ class UpdateWalletNameView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Shared schema of a wallet sync job (results/summary match the old synchronous response)
+WALLET_SYNC_JOB_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "job_id": {"type": "string"},
+        "status": {"type": "string", "enum": ["pending", "running", "completed", "failed"]},
+        "progress": {
+            "type": "object",
+            "properties": {
+                "completed": {"type": "integer"},
+                "total": {"type": "integer"}
+            }
+        },
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "wallet_address": {"type": "string"},
+                    "chain": {"type": "string"}, 
+                    "token_count": {"type": "integer"},
+                    "status": {"type": "string"},
+                    "error": {"type": "string", "nullable": True}
+                }
+            }
+        },
+        "summary": {
+            "type": "object",
+            "nullable": True,
+            "properties": {
+                "total_wallets": {"type": "integer"},
+                "successful": {"type": "integer"},
+                "failed": {"type": "integer"}
+            }
+        },
+        "error": {"type": "string", "nullable": True}
+    }
+}
+
+
+def _job_response_data(job):
+    """Strip internal fields from a job before returning it"""
+    return {key: value for key, value in job.items() if key not in ("user_id", "updated_at")}
+
+
 class SyncWalletsView(APIView):
-    """Sync all user wallets with fresh balance data"""
+    """Start a background sync of all user wallets"""
     permission_classes = [IsAuthenticated]
     
     @extend_schema(
         summary="Sync all user wallets", 
-        description="Fetch fresh balance data for all user wallets from Alchemy API",
+        description=(
+            "Start fetching fresh balance data for all user wallets from Alchemy API. "
+            "Returns a job immediately; poll the job status endpoint for per-wallet progress. "
+            "If a sync is already running for the user, that job is returned instead."
+        ),
         responses={
-            200: {
-                "type": "object",
-                "properties": {
-                    "results": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "wallet_address": {"type": "string"},
-                                "chain": {"type": "string"}, 
-                                "token_count": {"type": "integer"},
-                                "status": {"type": "string"},
-                                "error": {"type": "string", "nullable": True}
-                            }
-                        }
-                    },
-                    "summary": {
-                        "type": "object",
-                        "properties": {
-                            "total_wallets": {"type": "integer"},
-                            "successful": {"type": "integer"},
-                            "failed": {"type": "integer"}
-                        }
-                    }
-                }
-            }
+            202: WALLET_SYNC_JOB_SCHEMA,
+            500: {"type": "object", "properties": {"error": {"type": "string"}}}
         },
         tags=["Wallets"]
     )
     def get(self, request):
-        """Sync all wallets for the authenticated user"""
+        """Queue a sync job for the authenticated user"""
         try:
-            wallet_service = WalletService()
-            sync_results = wallet_service.sync_user_wallets(request.user)
+            user_wallets = list(UserWallet.objects.select_related('wallet').filter(user=request.user))
+
+            job_store = WalletSyncJobStore()
+            job, created = job_store.create_or_get_active(request.user, user_wallets)
+
+            if created:
+                try:
+                    sync_user_wallets_task.delay(request.user.pk, job["job_id"])
+                except Exception as e:
+                    # Release the user's claim, so the sync can be retried right away
+                    job_store.fail(job["job_id"], f"Failed to queue sync: {e}")
+                    raise
             
-            return Response(sync_results, status=status.HTTP_200_OK)
+            return Response(_job_response_data(job), status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
             return Response({
                 "error": f"Sync failed: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SyncWalletsStatusView(APIView):
+    """Get progress and results of a wallet sync job"""
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Get wallet sync job status",
+        operation_id="wallets_sync_status_retrieve",
+        description="Returns status, per-wallet progress and results of a wallet sync job",
+        responses={
+            200: WALLET_SYNC_JOB_SCHEMA,
+            404: {"type": "object", "properties": {"error": {"type": "string"}}}
+        },
+        tags=["Wallets"]
+    )
+    def get(self, request, job_id):
+        """Get sync job status for the authenticated user"""
+        job = WalletSyncJobStore().get(job_id)
+
+        if job is None or job["user_id"] != request.user.pk:
+            return Response({
+                "error": "Sync job not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(_job_response_data(job), status=status.HTTP_200_OK)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.portfolio.fixed_point import format_usd
+from apps.portfolio.models import WalletValuation
+from apps.wallets.services.refresh_policy import WalletRefreshPolicy
+from apps.wallets.services.scheduler import WalletRefreshScheduler
+
+
+class Command(BaseCommand):
+    help = 'Show the adaptive wallet refresh schedule, next to be refreshed first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50, help='Number of wallets to show')
+        parser.add_argument('--due', action='store_true', help='Only show wallets that are due now')
+
+    def handle(self, *_args, **options):
+        scheduler = WalletRefreshScheduler()
+        policy = WalletRefreshPolicy()
+        now = timezone.now()
+
+        wallets = scheduler.get_due_wallets() if options['due'] else scheduler.get_schedule()[:options['limit']]
+        wallets = wallets[:options['limit']]
+        totals = dict(
+            WalletValuation.objects.filter(wallet__in=wallets).values_list('wallet_id', 'total_usd')
+        )
+
+        self.stdout.write(
+            f"Refresh interval bounds: {policy.min_interval}s - {policy.max_interval}s, "
+            f"batch limit {scheduler.batch_limit}"
+        )
+        self.stdout.write(
+            f"{'address':<46} {'chain':<12} {'value_usd':>16} {'change':>7} {'interval':>9} {'next refresh':>14}"
+        )
+
+        for wallet in wallets:
+            total_usd = totals.get(wallet.pk, 0)
+            interval = policy.interval_seconds(wallet.change_rate, total_usd)
+
+            if wallet.next_refresh_at is None:
+                next_refresh = 'never synced'
+            elif wallet.next_refresh_at <= now:
+                next_refresh = 'due'
+            else:
+                next_refresh = f"in {int((wallet.next_refresh_at - now).total_seconds())}s"
+
+            self.stdout.write(
+                f"{wallet.address:<46} {wallet.chain:<12} {format_usd(total_usd):>16} "
+                f"{wallet.change_rate:>7.2f} {interval:>8}s {next_refresh:>14}"
+            )
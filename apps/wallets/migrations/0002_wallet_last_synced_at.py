@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
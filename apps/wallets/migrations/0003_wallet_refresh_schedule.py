@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0002_wallet_last_synced_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='change_rate',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='next_refresh_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='value_usd',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=40),
+        ),
+    ]
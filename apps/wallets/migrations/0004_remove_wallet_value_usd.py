@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0003_wallet_refresh_schedule'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='wallet',
+            name='value_usd',
+        ),
+    ]
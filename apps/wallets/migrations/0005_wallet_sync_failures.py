@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0004_remove_wallet_value_usd'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='sync_failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -7,6 +7,14 @@ class Wallet(models.Model):
     """
     address = models.CharField(max_length=255)
     chain = models.CharField(max_length=50)
+
+    # Last successful balance sync, shared by every user watching the wallet
+    last_synced_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # Adaptive refresh schedule, see WalletRefreshPolicy (the USD value comes from WalletValuation)
+    change_rate = models.FloatField(default=0)
+    sync_failures = models.PositiveSmallIntegerField(default=0)  # Consecutive failed syncs, backs off retries
+    next_refresh_at = models.DateTimeField(null=True, blank=True, db_index=True)
     
     class Meta:
         unique_together = ('address', 'chain')
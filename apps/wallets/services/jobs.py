@@ -0,0 +1,166 @@
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from config.chain_mapping import COINGECKO_TO_FRONTEND_MAPPING
+
+JOB_CACHE_KEY = "wallets:sync_job:{job_id}"
+USER_JOB_CACHE_KEY = "wallets:sync_job:user:{user_id}"
+
+# Jobs (and their results) are kept for an hour after the last update
+JOB_TIMEOUT = 60 * 60
+
+# A pending or running job not updated for this long is treated as dead (lost
+# task or killed worker); the user's active job key expires after the same time
+JOB_STALE_SECONDS = getattr(settings, "WALLET_SYNC_JOB_STALE_SECONDS", 300)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class WalletSyncJobStore:
+    """
+    Stores wallet sync job state in the cache
+
+    A job mirrors the synchronous sync response ("results" and "summary")
+    and adds its id, status and progress counters so clients can poll it.
+
+    The user's active job is claimed atomically with cache.add. The claim
+    expires JOB_STALE_SECONDS after the job's last update and is released
+    when the job finishes, so a lost job does not block new syncs.
+    """
+
+    # Per-wallet updates may arrive from several threads of the same worker
+    _lock = threading.Lock()
+
+    def create_or_get_active(self, user, user_wallets):
+        """
+        Create a sync job for the user, or return the one already in progress
+
+        Args:
+            user: The user object
+            user_wallets: UserWallet instances (with wallet selected) to sync
+
+        Returns:
+            tuple: (job dict, created_bool)
+        """
+        user_key = USER_JOB_CACHE_KEY.format(user_id=user.pk)
+        job = self._new_job(user, user_wallets)
+
+        # The claim can expire between add and get, so try twice
+        for _ in range(2):
+            if cache.add(user_key, job["job_id"], timeout=JOB_STALE_SECONDS):
+                self._save(job)
+                return job, True
+
+            active_job_id = cache.get(user_key)
+            active_job = self.get(active_job_id) if active_job_id else None
+            if active_job and active_job["status"] in (PENDING, RUNNING):
+                return active_job, False
+
+            if active_job_id:
+                # Claimed by a job that finished or is gone
+                self._release(user.pk, active_job_id)
+
+        raise RuntimeError("Could not claim a sync job for the user")
+
+    def _new_job(self, user, user_wallets):
+        return {
+            "job_id": uuid.uuid4().hex,
+            "user_id": user.pk,
+            "status": PENDING,
+            "progress": {
+                "completed": 0,
+                "total": len(user_wallets)
+            },
+            "results": [
+                {
+                    "wallet_address": user_wallet.wallet.address,
+                    "chain": COINGECKO_TO_FRONTEND_MAPPING.get(user_wallet.wallet.chain, user_wallet.wallet.chain),
+                    "token_count": 0,
+                    "status": "Pending"
+                }
+                for user_wallet in user_wallets
+            ],
+            "summary": None,
+        }
+
+    def get(self, job_id):
+        """
+        Get job state, or None if unknown or expired
+
+        A pending or running job without updates for JOB_STALE_SECONDS is
+        reported as failed.
+        """
+        job = cache.get(JOB_CACHE_KEY.format(job_id=job_id))
+
+        if job and job["status"] in (PENDING, RUNNING) and time.time() - job["updated_at"] > JOB_STALE_SECONDS:
+            job.update(status=FAILED, error="Sync job stopped responding")
+
+        return job
+
+    def mark_running(self, job_id):
+        self._update(job_id, lambda job: job.update(status=RUNNING))
+
+    def record_result(self, job_id, result):
+        """
+        Store the result of a single wallet as soon as it is known
+
+        Args:
+            job_id: Job identifier
+            result: Per-wallet result entry from WalletService
+        """
+        def apply(job):
+            for index, entry in enumerate(job["results"]):
+                if (
+                    entry["wallet_address"] == result["wallet_address"]
+                    and entry["chain"] == result["chain"]
+                    and entry["status"] == "Pending"
+                ):
+                    job["results"][index] = result
+                    job["progress"]["completed"] += 1
+                    return
+
+        self._update(job_id, apply)
+
+    def complete(self, job_id, sync_results):
+        """Store the final sync response"""
+        def apply(job):
+            job.update(
+                status=COMPLETED,
+                results=sync_results["results"],
+                summary=sync_results["summary"],
+            )
+            job["progress"]["completed"] = job["progress"]["total"]
+
+        self._update(job_id, apply)
+
+    def fail(self, job_id, error):
+        self._update(job_id, lambda job: job.update(status=FAILED, error=error))
+
+    def _update(self, job_id, apply):
+        with self._lock:
+            job = cache.get(JOB_CACHE_KEY.format(job_id=job_id))
+            if job is None:
+                return
+            apply(job)
+            self._save(job)
+
+            if job["status"] in (PENDING, RUNNING):
+                # Every update keeps the user's claim alive
+                cache.touch(USER_JOB_CACHE_KEY.format(user_id=job["user_id"]), JOB_STALE_SECONDS)
+            else:
+                self._release(job["user_id"], job_id)
+
+    def _release(self, user_id, job_id):
+        """Release the user's active job key if it still belongs to the job"""
+        user_key = USER_JOB_CACHE_KEY.format(user_id=user_id)
+        if cache.get(user_key) == job_id:
+            cache.delete(user_key)
+
+    def _save(self, job):
+        job["updated_at"] = time.time()
+        cache.set(JOB_CACHE_KEY.format(job_id=job["job_id"]), job, timeout=JOB_TIMEOUT)
@@ -0,0 +1,132 @@
+import math
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from ...portfolio.fixed_point import USD_DECIMALS
+from ...portfolio.models import WalletValuation
+
+# Weight of the latest sync in the change rate moving average
+CHANGE_RATE_SMOOTHING = 0.3
+
+# Failures counted for the retry back-off (2 ** 15 already exceeds any sane interval ratio)
+MAX_SYNC_FAILURES = 15
+
+
+class WalletRefreshPolicy:
+    """
+    Derives each wallet's next refresh time from its activity and value
+
+    change_rate is an exponential moving average of "balances changed since
+    the previous sync" (0 = never changes, 1 = changes every sync). Active
+    wallets are refreshed close to the minimum interval and dormant ones
+    close to the maximum; a larger USD value shortens the interval further.
+    A failed sync is retried after the minimum interval, doubled for each
+    consecutive failure up to the maximum.
+    """
+
+    def __init__(self, min_interval=None, max_interval=None):
+        """
+        Initialize the policy
+
+        Args:
+            min_interval: Shortest refresh interval in seconds (defaults to settings)
+            max_interval: Longest refresh interval in seconds (defaults to settings)
+        """
+        self.min_interval = min_interval or getattr(settings, "WALLET_REFRESH_MIN_INTERVAL_SECONDS", 600)
+        self.max_interval = max_interval or getattr(settings, "WALLET_REFRESH_MAX_INTERVAL_SECONDS", 86400)
+
+    def interval_seconds(self, change_rate, total_usd):
+        """
+        Get the refresh interval for a wallet
+
+        Args:
+            change_rate: Fraction of recent syncs that changed balances (0-1)
+            total_usd: Wallet value in USD units (WalletValuation.total_usd)
+
+        Returns:
+            int: Seconds until the next refresh, within the configured bounds
+        """
+        interval = self.min_interval + (self.max_interval - self.min_interval) * (1 - change_rate)
+        interval /= 1 + math.log10(1 + max(total_usd, 0) / 10 ** USD_DECIMALS)
+        return int(min(max(interval, self.min_interval), self.max_interval))
+
+    def record_sync(self, wallet, changed, total_usd=None, synced_at=None):
+        """
+        Update the wallet's activity stats and schedule its next refresh
+
+        Args:
+            wallet: Wallet instance that was just synced
+            changed: Whether the sync changed any of its balances
+            total_usd: Wallet value in USD units (read from WalletValuation if omitted)
+            synced_at: Sync time (defaults to now)
+
+        Returns:
+            dict: The fields written to the wallet
+        """
+        synced_at = synced_at or timezone.now()
+
+        if wallet.last_synced_at is None:
+            # First sync tells nothing about activity, start in the middle
+            change_rate = 0.5
+        else:
+            change_rate = CHANGE_RATE_SMOOTHING * int(changed) + (1 - CHANGE_RATE_SMOOTHING) * wallet.change_rate
+
+        if total_usd is None:
+            total_usd = self.wallet_total_usd(wallet)
+
+        fields = {
+            'last_synced_at': synced_at,
+            'change_rate': change_rate,
+            'sync_failures': 0,
+            'next_refresh_at': synced_at + timedelta(seconds=self.interval_seconds(change_rate, total_usd)),
+        }
+
+        type(wallet).objects.filter(pk=wallet.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(wallet, name, value)
+
+        return fields
+
+    def failure_interval_seconds(self, failures):
+        """
+        Get the retry delay after consecutive failed syncs
+
+        Args:
+            failures: Number of consecutive failures, including the latest one
+
+        Returns:
+            int: Seconds until the next attempt, within the configured bounds
+        """
+        return int(min(self.min_interval * 2 ** (max(failures, 1) - 1), self.max_interval))
+
+    def record_failure(self, wallet, failed_at=None):
+        """
+        Back off the next refresh of a wallet whose sync failed
+
+        Without this, a failing wallet stays at the head of the due queue
+        and is retried on every scheduler run.
+
+        Args:
+            wallet: Wallet instance whose sync raised
+            failed_at: Failure time (defaults to now)
+
+        Returns:
+            dict: The fields written to the wallet
+        """
+        failed_at = failed_at or timezone.now()
+        failures = min(wallet.sync_failures + 1, MAX_SYNC_FAILURES)
+
+        fields = {
+            'sync_failures': failures,
+            'next_refresh_at': failed_at + timedelta(seconds=self.failure_interval_seconds(failures)),
+        }
+
+        type(wallet).objects.filter(pk=wallet.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(wallet, name, value)
+
+        return fields
+
+    def wallet_total_usd(self, wallet):
+        """Get the wallet's maintained USD value in USD units, 0 if never valued"""
+        return WalletValuation.objects.filter(wallet=wallet).values_list('total_usd', flat=True).first() or 0
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from ..models import Wallet, UserWallet
+from .services import WalletService, freshness_cutoff
+
+
+class WalletRefreshScheduler:
+    """
+    Periodically refreshes due wallets, once per wallet regardless of watchers
+
+    Each wallet carries its own next_refresh_at (see WalletRefreshPolicy), so
+    active and valuable wallets come up often and dormant ones rarely. Never
+    synced wallets come first, then the most overdue ones.
+    """
+
+    def __init__(self, batch_limit=None):
+        """
+        Initialize the scheduler
+
+        Args:
+            batch_limit: Maximum wallets refreshed per run (defaults to settings)
+        """
+        self.batch_limit = batch_limit or getattr(settings, "WALLET_REFRESH_BATCH_LIMIT", 200)
+
+    def get_schedule(self):
+        """
+        Get every watched wallet ordered by refresh priority
+
+        Returns:
+            QuerySet: Wallet instances, next to be refreshed first
+        """
+        return Wallet.objects.filter(
+            Exists(UserWallet.objects.filter(wallet=OuterRef('pk')))
+        ).order_by(F('next_refresh_at').asc(nulls_first=True), 'pk')
+
+    def get_due_wallets(self):
+        """
+        Get watched wallets whose next refresh time has passed
+
+        Wallets synced within the freshness window (e.g. by a user sync) are
+        left out: sync_wallets would skip them without rescheduling, so they
+        would take batch slots on every run until the window passed.
+
+        Returns:
+            list: Wallet instances, highest priority first
+        """
+        return list(
+            self.get_schedule().filter(
+                Q(next_refresh_at__isnull=True) | Q(next_refresh_at__lte=timezone.now())
+            ).exclude(
+                last_synced_at__gte=freshness_cutoff()
+            )[:self.batch_limit]
+        )
+
+    def refresh_due_wallets(self):
+        """
+        Sync the highest priority due wallets
+
+        Returns:
+            dict: Number of due, synced and failed wallets
+        """
+        due_wallets = self.get_due_wallets()
+        if not due_wallets:
+            return {"due": 0, "synced": 0, "failed": 0}
+
+        outcomes = WalletService().sync_wallets(due_wallets)
+        failed = sum(1 for outcome in outcomes.values() if isinstance(outcome, Exception))
+
+        return {
+            "due": len(due_wallets),
+            "synced": len(outcomes) - failed,
+            "failed": failed
+        }
@@ -1,10 +1,42 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count
+from django.utils import timezone
 from apps.integrations.alchemy.client import AlchemyClient
-from apps.integrations.alchemy.service import AlchemyWalletService
+from apps.integrations.alchemy.service import AlchemyWalletService, wallet_key
+from apps.integrations.rate_limit import CacheSemaphore
 from ..models import Wallet, UserWallet
+from ...portfolio.cache import bump_user_versions
 from ...portfolio.models import WalletTokenBalance
+from ...portfolio.services.valuation import ValuationService
 from ...tokens.models import Token, TokenMaster
+from ...prices.services.service import HeldTokenService
+from .refresh_policy import WalletRefreshPolicy
 from config.chain_mapping import ALCHEMY_NETWORK_MAPPING, FRONTEND_TO_ALCHEMY_MAPPING, COINGECKO_TO_ALCHEMY_MAPPING, FRONTEND_TO_COINGECKO_MAPPING, COINGECKO_TO_FRONTEND_MAPPING
 
+# WalletTokenBalance.raw_balance is DecimalField(78, 0), enough for any uint256
+MAX_RAW_BALANCE = 10 ** 78
+
+# In-flight lock per wallet, so concurrent syncs of a shared wallet fetch it once
+WALLET_SYNC_LOCK_KEY = "wallets:sync_lock:{wallet_id}"
+WALLET_SYNC_LOCK_TIMEOUT = 120
+
+
+def freshness_cutoff():
+    """Sync time after which a wallet counts as fresh and is not fetched again"""
+    return timezone.now() - timedelta(seconds=getattr(settings, "WALLET_FRESHNESS_SECONDS", 600))
+
+
+# Cap on Alchemy batches fetched at once across all users and worker processes
+_global_sync_slots = CacheSemaphore(
+    "wallets:sync_slots",
+    getattr(settings, "WALLET_SYNC_GLOBAL_MAX_CONCURRENCY", 16),
+    lease_seconds=WALLET_SYNC_LOCK_TIMEOUT,
+)
 
 
 class WalletService:
@@ -40,8 +72,7 @@ class WalletService:
         # Validate wallet with Alchemy and get token balances
         try:
             alchemy_network = FRONTEND_TO_ALCHEMY_MAPPING[chain]
-            response_data = self.alchemy_client.get_wallet_balances(address, alchemy_network)
-            valid_tokens = self.alchemy_service.process_wallet_balances(response_data)
+            valid_tokens = self._fetch_valid_tokens(address, alchemy_network)
         except Exception as e:
             raise Exception(f"Failed to validate wallet with Alchemy: {str(e)}")
 
@@ -50,7 +81,10 @@ class WalletService:
         self._create_user_wallet(user, wallet, name)
 
         #  database records for WalletTokenBalance model
-        token_count = self._create_or_update_token_balances(wallet, valid_tokens, coingecko_chain_name, update_mode=False)
+        token_count, changed = self._create_or_update_token_balances(wallet, valid_tokens, coingecko_chain_name, update_mode=False)
+
+        # The user gained a wallet even when its (shared) balances did not change
+        self._refresh_watchers([wallet.pk] if changed else [], user_ids=[user.pk])
 
         return {
                 'address': address,
@@ -59,6 +93,15 @@ class WalletService:
                 'token_count': token_count
                 }
 
+    def _fetch_valid_tokens(self, address, networks):
+        """
+        Fetch every page of a wallet's balances and return the valid tokens
+
+        Tokens are filtered as pages arrive, so raw pages are not accumulated.
+        """
+        tokens = self.alchemy_client.iter_wallets_tokens([(address, networks)])
+        return list(self.alchemy_service.iter_valid_tokens(tokens))
+
     def _wallet_exists_for_user(self, user, address, chain):
         """Check if user already has this wallet"""
         return UserWallet.objects.filter(
@@ -108,6 +151,9 @@ class WalletService:
             # Check if any records were deleted
             if deleted_count == 0:
                 return False, f"Wallet with address {address} on chain {chain} not found in your portfolio"
+
+            ValuationService().refresh_users([user.pk])
+            bump_user_versions([user.pk])
                 
             return True, f"Wallet {address} ({chain}) has been removed from your portfolio"
             
@@ -144,6 +190,7 @@ class WalletService:
                 user_wallet.name = None
             
             user_wallet.save()
+            bump_user_versions([user.pk])
             return True, f"Wallet name updated successfully"
             
         except UserWallet.DoesNotExist:
@@ -152,131 +199,416 @@ class WalletService:
             return False, f"Failed to update wallet name: {str(e)}"
 
 
-    def sync_user_wallets(self, user):
+    def sync_user_wallets(self, user, progress_callback=None):
         """
         Sync all wallets for a user with fresh balance data
         
         Args:
             user: The user object
+            progress_callback: Optional callable receiving each wallet's
+                result dict as soon as that wallet finishes
             
         Returns:
             dict: Sync results with individual wallet status and summary
         """
-        user_wallets = UserWallet.objects.select_related('wallet').filter(user=user)
-        
-        results = []
-        successful_count = 0
-        failed_count = 0
-        
-        for user_wallet in user_wallets:
-            wallet = user_wallet.wallet
+        user_wallets = list(UserWallet.objects.select_related('wallet').filter(user=user))
 
-            frontend_chain = COINGECKO_TO_FRONTEND_MAPPING[wallet.chain]
-            
-            try:
-                token_count = self._sync_single_wallet(wallet)
-                
-                results.append({
-                    "wallet_address": wallet.address,
-                    "chain": frontend_chain,
-                    "token_count": token_count,
-                    "status": "Success"
-                })
-                successful_count += 1
-                
-            except Exception as e:
-                results.append({
-                    "wallet_address": wallet.address, 
-                    "chain": frontend_chain,
-                    "token_count": 0,
-                    "status": "Failure",
-                    "error": str(e)
-                })
-                failed_count += 1
+        def on_outcome(wallet, outcome):
+            if progress_callback:
+                progress_callback(self._wallet_sync_result(wallet, outcome))
+
+        # Fetch balances for all wallets in as few Alchemy requests as possible
+        outcomes = self.sync_wallets([user_wallet.wallet for user_wallet in user_wallets], on_outcome=on_outcome)
+        
+        results = [
+            self._wallet_sync_result(user_wallet.wallet, outcomes[user_wallet.wallet.pk])
+            for user_wallet in user_wallets
+        ]
+        successful_count = sum(1 for result in results if result["status"] == "Success")
         
         return {
             "results": results,
             "summary": {
                 "total_wallets": len(user_wallets),
                 "successful": successful_count,
-                "failed": failed_count
+                "failed": len(results) - successful_count
             }
         }
 
-    def _sync_single_wallet(self, wallet):
+    def _wallet_sync_result(self, wallet, outcome):
         """
-        Sync a single wallet with fresh data from Alchemy
-        
+        Build the per-wallet entry of a sync response
+
         Args:
             wallet: Wallet instance
-            
+            outcome: Token count, or the Exception the wallet failed with
+
         Returns:
-            int: Number of tokens found in wallet
-            
-        Raises:
-            Exception: If sync fails
+            dict: Result entry for the wallet
         """
-        alchemy_network = COINGECKO_TO_ALCHEMY_MAPPING[wallet.chain]
-        networks = [alchemy_network]
-        
-        response_data = self.alchemy_client.get_wallet_balances(wallet.address, networks)
-        valid_tokens = self.alchemy_service.process_wallet_balances(response_data)
-        
-        token_count = self._create_or_update_token_balances(wallet, valid_tokens, wallet.chain, update_mode=True)
-        
-        return token_count
+        frontend_chain = COINGECKO_TO_FRONTEND_MAPPING.get(wallet.chain, wallet.chain)
 
-    def _create_or_update_token_balances(self, wallet, valid_tokens, chain, update_mode=False):
-        """Create or update WalletTokenBalance records"""
-        processed_token_ids: set[int] = set()
-        token_count = 0
-        
-        for token_data in valid_tokens:
-            contract_address = None
-            try:
-                contract_address = token_data['contract_address']
-                
-                if contract_address is None:
-                    token = Token.objects.get(chain=chain, contract_address="native")
-                else:
-                    token = Token.objects.get(contract_address=contract_address, chain=chain)
-                
-                if update_mode:
-                    WalletTokenBalance.objects.update_or_create(
-                        wallet=wallet,
-                        token=token,
-                        defaults={'balance': token_data['decimal_balance']}
-                    )
-                    processed_token_ids.add(token.pk)
-                else:
-                    WalletTokenBalance.objects.create(
-                        wallet=wallet,
-                        token=token,
-                        balance=token_data['decimal_balance']
+        if isinstance(outcome, Exception):
+            return {
+                "wallet_address": wallet.address, 
+                "chain": frontend_chain,
+                "token_count": 0,
+                "status": "Failure",
+                "error": str(outcome)
+            }
+
+        return {
+            "wallet_address": wallet.address,
+            "chain": frontend_chain,
+            "token_count": outcome,
+            "status": "Success"
+        }
+
+    def sync_wallets(self, wallets, on_outcome=None):
+        """
+        Sync several wallets using batched Alchemy requests
+
+        Batches run concurrently (up to WALLET_SYNC_MAX_CONCURRENCY_PER_USER),
+        and each wallet's outcome is recorded independently. Wallets synced
+        within WALLET_FRESHNESS_SECONDS, or being fetched by another sync,
+        are not fetched again; their stored token count is reported instead.
+
+        Args:
+            wallets: Iterable of Wallet instances
+            on_outcome: Optional callable(wallet, outcome) invoked as each wallet finishes
+
+        Returns:
+            dict: wallet.pk -> token count, or the Exception that made that wallet fail
+        """
+        outcomes = {}
+        failed_wallets = []
+
+        def record(wallet, outcome):
+            outcomes[wallet.pk] = outcome
+            if isinstance(outcome, Exception):
+                failed_wallets.append(wallet)
+            if on_outcome:
+                on_outcome(wallet, outcome)
+
+        supported_wallets = []
+        for wallet in wallets:
+            if wallet.chain in COINGECKO_TO_ALCHEMY_MAPPING:
+                supported_wallets.append(wallet)
+            else:
+                record(wallet, ValueError(f"Unsupported chain: {wallet.chain}"))
+
+        # Coalesce: skip wallets refreshed within the freshness window and
+        # wait for wallets another sync is already fetching
+        fresh_wallets, stale_wallets = self._split_fresh_wallets(supported_wallets)
+        claimed_wallets, busy_wallets = self._claim_wallets(stale_wallets)
+        changed_wallet_ids = set()
+
+        try:
+            self._run_wallet_batches(self._build_balance_batches(claimed_wallets), record, changed_wallet_ids)
+        finally:
+            self._release_wallets(claimed_wallets)
+
+            # Rebuild each watcher once, however many of their wallets changed
+            self._refresh_watchers(changed_wallet_ids)
+
+            # Failed wallets are retried later and later instead of on every run
+            refresh_policy = WalletRefreshPolicy()
+            for wallet in failed_wallets:
+                refresh_policy.record_failure(wallet)
+
+        if busy_wallets:
+            self._wait_for_wallets(busy_wallets)
+
+        reused_wallets = fresh_wallets + busy_wallets
+        if reused_wallets:
+            token_counts = self._token_counts(reused_wallets)
+            for wallet in reused_wallets:
+                record(wallet, token_counts.get(wallet.pk, 0))
+
+        return outcomes
+
+    def _run_wallet_batches(self, batches, record, changed_wallet_ids):
+        """Run request batches, concurrently when there is more than one"""
+        max_workers = min(len(batches), getattr(settings, "WALLET_SYNC_MAX_CONCURRENCY_PER_USER", 4))
+
+        if max_workers <= 1:
+            for address_networks, batch_wallets in batches:
+                self._sync_wallet_batch(address_networks, batch_wallets, record, changed_wallet_ids)
+        else:
+            # Batches run concurrently; each one records its own wallets' outcomes
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        self._sync_wallet_batch_in_thread, address_networks, batch_wallets, record, changed_wallet_ids
                     )
-                
-                token_count += 1
-                
-            except Token.DoesNotExist:
-                print(f"Token not found: {contract_address} on {chain}")
-                continue
+                    for address_networks, batch_wallets in batches
+                ]
+                for future in futures:
+                    future.result()
+
+    def _split_fresh_wallets(self, wallets):
+        """
+        Split wallets into those synced within the freshness window and the rest
+
+        Returns:
+            tuple: (fresh_wallets, stale_wallets)
+        """
+        cutoff = freshness_cutoff()
+
+        fresh_wallets = []
+        stale_wallets = []
+        for wallet in wallets:
+            if wallet.last_synced_at and wallet.last_synced_at >= cutoff:
+                fresh_wallets.append(wallet)
+            else:
+                stale_wallets.append(wallet)
+
+        return fresh_wallets, stale_wallets
+
+    def _claim_wallets(self, wallets):
+        """
+        Take the in-flight lock for each wallet
+
+        Returns:
+            tuple: (claimed_wallets, busy_wallets) where busy wallets are
+            already being fetched by another sync
+        """
+        claimed_wallets = []
+        busy_wallets = []
+        for wallet in wallets:
+            if cache.add(WALLET_SYNC_LOCK_KEY.format(wallet_id=wallet.pk), 1, timeout=WALLET_SYNC_LOCK_TIMEOUT):
+                claimed_wallets.append(wallet)
+            else:
+                busy_wallets.append(wallet)
+
+        return claimed_wallets, busy_wallets
+
+    def _release_wallets(self, wallets):
+        if wallets:
+            cache.delete_many([WALLET_SYNC_LOCK_KEY.format(wallet_id=wallet.pk) for wallet in wallets])
+
+    def _wait_for_wallets(self, wallets):
+        """Wait until in-flight fetches of the given wallets finish (or the lock expires)"""
+        lock_keys = [WALLET_SYNC_LOCK_KEY.format(wallet_id=wallet.pk) for wallet in wallets]
+        deadline = time.monotonic() + WALLET_SYNC_LOCK_TIMEOUT
+
+        while time.monotonic() < deadline and cache.get_many(lock_keys):
+            time.sleep(0.5)
+
+    def _token_counts(self, wallets):
+        """Get stored token counts for several wallets in one query"""
+        return dict(
+            WalletTokenBalance.objects.filter(
+                wallet__in=wallets
+            ).values('wallet_id').annotate(count=Count('id')).values_list('wallet_id', 'count')
+        )
+
+    def _sync_wallet_batch_in_thread(self, address_networks, batch_wallets, record, changed_wallet_ids):
+        """Run a batch sync in a worker thread and release its database connection"""
+        try:
+            self._sync_wallet_batch(address_networks, batch_wallets, record, changed_wallet_ids)
+        finally:
+            connections.close_all()
+
+    def _sync_wallet_batch(self, address_networks, batch_wallets, record, changed_wallet_ids):
+        """
+        Fetch one Alchemy request batch and write each of its wallets
+
+        Args:
+            address_networks: Request entries for the batch
+            batch_wallets: Wallet instances covered by the batch
+            record: Callable(wallet, outcome) storing each wallet's outcome
+            changed_wallet_ids: Set collecting ids of wallets whose balances changed
+        """
+        # Cap concurrent Alchemy batches across all syncs in every process
+        with _global_sync_slots.slot():
+            try:
+                # Tokens are filtered and converted as pages stream in, then
+                # demultiplexed back to each wallet by (address, network)
+                valid_tokens_by_wallet = {}
+                for token_data in self.alchemy_client.iter_wallets_tokens(address_networks):
+                    processed_token = self.alchemy_service.process_token(token_data)
+                    if processed_token:
+                        key = wallet_key(token_data['address'], token_data['network'])
+                        valid_tokens_by_wallet.setdefault(key, []).append(processed_token)
+            except Exception as e:
+                for wallet in batch_wallets:
+                    record(wallet, e)
+                return
+
+        for wallet in batch_wallets:
+            try:
+                alchemy_network = COINGECKO_TO_ALCHEMY_MAPPING[wallet.chain]
+                valid_tokens = valid_tokens_by_wallet.get(wallet_key(wallet.address, alchemy_network), [])
+
+                outcome, changed = self._create_or_update_token_balances(wallet, valid_tokens, wallet.chain, update_mode=True)
+                if changed:
+                    changed_wallet_ids.add(wallet.pk)
             except Exception as e:
-                print(f"Error processing balance record: {e}")
+                outcome = e
+
+            record(wallet, outcome)
+
+    def _build_balance_batches(self, wallets):
+        """
+        Group wallets into Alchemy request batches
+
+        Wallets sharing an address are merged into one entry with several
+        networks, and entries are packed up to the per-request address limit.
+
+        Args:
+            wallets: Iterable of Wallet instances
+
+        Returns:
+            list: (address_networks, wallets) tuples, one per request
+        """
+        max_networks = self.alchemy_client.MAX_NETWORKS_PER_ADDRESS
+        max_addresses = self.alchemy_client.MAX_ADDRESSES_PER_REQUEST
+
+        wallets_by_address = {}
+        for wallet in wallets:
+            wallets_by_address.setdefault(wallet.address, []).append(wallet)
+
+        # One request entry per address and group of up to max_networks networks
+        entries = []
+        for address, address_wallets in wallets_by_address.items():
+            for i in range(0, len(address_wallets), max_networks):
+                group = address_wallets[i:i + max_networks]
+                networks = [COINGECKO_TO_ALCHEMY_MAPPING[wallet.chain] for wallet in group]
+                entries.append(((address, networks), group))
+
+        batches = []
+        for i in range(0, len(entries), max_addresses):
+            batch = entries[i:i + max_addresses]
+            batches.append((
+                [address_networks for address_networks, _ in batch],
+                [wallet for _, group in batch for wallet in group],
+            ))
+
+        return batches
+
+    def _create_or_update_token_balances(self, wallet, valid_tokens, chain, update_mode=False):
+        """
+        Create or update WalletTokenBalance records with set-based queries
+
+        Resolves every token in one query, upserts all balances in one
+        statement and, in update mode, deletes vanished tokens in one
+        statement, all inside a single transaction. Only a wallet whose
+        balances changed is revalued; its watchers' valuations and cached
+        responses are left to the caller (see _refresh_watchers).
+
+        Returns:
+            tuple: (token_count, changed)
+        """
+        # contract_address -> (raw_balance, decimals); a None address is the chain's native token
+        balances = {}
+        for token_data in valid_tokens:
+            contract_address = token_data['contract_address'] or "native"
+            raw_balance = token_data['raw_balance']
+
+            if abs(raw_balance) >= MAX_RAW_BALANCE:
+                print(f"Balance out of range for {contract_address} on {chain}: {raw_balance}")
                 continue
-        
-        if update_mode:
-            if processed_token_ids:
-                # Delete tokens that are no longer in the wallet
-                deleted_count, _ = WalletTokenBalance.objects.filter(
+
+            balances[contract_address] = (raw_balance, token_data['decimals'])
+
+        token_ids = dict(
+            Token.objects.filter(
+                chain=chain,
+                contract_address__in=balances.keys()
+            ).values_list('contract_address', 'id')
+        )
+
+        for contract_address in balances.keys() - token_ids.keys():
+            print(f"Token not found: {contract_address} on {chain}")
+
+        token_balances = [
+            WalletTokenBalance(
+                wallet=wallet,
+                token_id=token_ids[contract_address],
+                raw_balance=raw_balance,
+                decimals=decimals
+            )
+            for contract_address, (raw_balance, decimals) in balances.items()
+            if contract_address in token_ids
+        ]
+
+        with transaction.atomic():
+            previous_balances = {
+                token_id: (int(raw_balance), decimals)
+                for token_id, raw_balance, decimals in WalletTokenBalance.objects.filter(
                     wallet=wallet
-                ).exclude(token_id__in=processed_token_ids).delete()
-            else:
-                # If no tokens were processed, delete ALL old tokens (empty wallet)
+                ).values_list('token_id', 'raw_balance', 'decimals')
+            }
+            changed = self._balances_changed(previous_balances, token_balances, update_mode)
+
+            if token_balances:
+                WalletTokenBalance.objects.bulk_create(
+                    token_balances,
+                    update_conflicts=True,
+                    unique_fields=['wallet', 'token'],
+                    update_fields=['raw_balance', 'decimals', 'last_updated'],
+                )
+
+            if update_mode:
+                # Delete tokens that are no longer in the wallet (all of them if it is empty)
                 deleted_count, _ = WalletTokenBalance.objects.filter(
                     wallet=wallet
-                ).delete()
-            
-            if deleted_count > 0:
-                print(f"Removed {deleted_count} old token records for wallet {wallet.address}")
+                ).exclude(token_id__in=token_ids.values()).delete()
+
+                if deleted_count > 0:
+                    print(f"Removed {deleted_count} old token records for wallet {wallet.address}")
+
+            # Unchanged balances keep their stored valuation
+            total_usd = None
+            if changed:
+                total_usd = ValuationService().revalue_wallets([wallet.pk])[wallet.pk]
+
+            # Record activity and schedule the next refresh
+            WalletRefreshPolicy().record_sync(wallet, changed, total_usd=total_usd)
+
+        # Keep the fast price refresh aware of newly held tokens
+        new_token_ids = {token_balance.token_id for token_balance in token_balances} - previous_balances.keys()
+        if new_token_ids:
+            HeldTokenService().add_held_tokens(new_token_ids)
         
-        return token_count
+        return len(token_balances), changed
+
+    def _refresh_watchers(self, wallet_ids, user_ids=()):
+        """
+        Rebuild user valuations and invalidate cached responses after wallet writes
+
+        Args:
+            wallet_ids: Ids of wallets whose balances changed; all their watchers are refreshed
+            user_ids: Additional users to refresh (e.g. one who just added a wallet)
+        """
+        user_ids = set(user_ids)
+        if wallet_ids:
+            user_ids.update(UserWallet.objects.filter(wallet_id__in=wallet_ids).values_list('user_id', flat=True))
+
+        if user_ids:
+            ValuationService().refresh_users(user_ids)
+            bump_user_versions(user_ids)
+
+    def _balances_changed(self, previous_balances, token_balances, update_mode):
+        """
+        Check whether a sync changes a wallet's stored balances
+
+        Args:
+            previous_balances: Stored token_id -> (raw_balance, decimals)
+            token_balances: WalletTokenBalance instances about to be written
+            update_mode: Whether tokens missing from token_balances get deleted
+        """
+        new_balances = {
+            token_balance.token_id: (token_balance.raw_balance, token_balance.decimals)
+            for token_balance in token_balances
+        }
+
+        if update_mode and previous_balances.keys() != new_balances.keys():
+            return True
+
+        # Raw integers compare exactly
+        return any(
+            previous_balances.get(token_id) != balance
+            for token_id, balance in new_balances.items()
+        )
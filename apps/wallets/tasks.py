@@ -0,0 +1,39 @@
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from .services.jobs import WalletSyncJobStore
+from .services.scheduler import WalletRefreshScheduler
+from .services.services import WalletService
+
+@shared_task
+def sync_user_wallets_task(user_id, job_id):
+    """
+    Sync all wallets of a user in the background
+
+    Progress and results are written to the job store as each wallet finishes
+    """
+    store = WalletSyncJobStore()
+
+    try:
+        user = get_user_model().objects.get(pk=user_id)
+        store.mark_running(job_id)
+
+        wallet_service = WalletService()
+        sync_results = wallet_service.sync_user_wallets(
+            user,
+            progress_callback=lambda result: store.record_result(job_id, result)
+        )
+
+        store.complete(job_id, sync_results)
+        return f"Wallet sync job {job_id}: {sync_results['summary']}"
+
+    except Exception as e:
+        print(f"Wallet sync job {job_id} failed: {e}")
+        store.fail(job_id, str(e))
+        raise
+
+
+@shared_task
+def refresh_stale_wallets_task():
+    """Refresh watched wallets whose next refresh time has passed"""
+    stats = WalletRefreshScheduler().refresh_due_wallets()
+    return f"Wallet refresh: {stats['synced']} synced, {stats['failed']} failed of {stats['due']} due"
@@ -17,6 +17,8 @@ app.autodiscover_tasks()
 app.autodiscover_tasks([
     'apps.integrations.coingecko',
     'apps.integrations.jupiter',
+    'apps.portfolio',
+    'apps.wallets',
 ])
 
 @app.task(bind=True)
@@ -121,6 +121,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.integrations.jupiter.tasks.sync_jupiter_solana_decimals_task',
         'schedule': crontab(minute=22, hour='21,5,11'), # type: ignore
         },
+    'sync-held-token-prices': {
+        'task': 'apps.integrations.coingecko.tasks.sync_held_token_prices_task',
+        'schedule': crontab(minute='*/5'), # type: ignore
+    },
+    'refresh-stale-wallets': {
+        'task': 'apps.wallets.tasks.refresh_stale_wallets_task',
+        'schedule': crontab(minute='*/5'), # type: ignore
+    },
+    'take-portfolio-snapshots': {
+        'task': 'apps.portfolio.tasks.take_portfolio_snapshots_task',
+        'schedule': crontab(minute=55, hour=23), # type: ignore
+    },
 }
 CELERY_TIMEZONE = 'Europe/Riga'
 
@@ -183,3 +195,30 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # API Keys
 COINGECKO_API_KEY= env('COINGECKO_API_KEY')
 ALCHEMY_API_KEY= env('ALCHEMY_API_KEY')
+
+# CoinGecko plan quota (requests per minute) and concurrent page fetches
+COINGECKO_RATE_LIMIT_PER_MINUTE = env.int('COINGECKO_RATE_LIMIT_PER_MINUTE', default=30)
+COINGECKO_MAX_CONCURRENT_REQUESTS = env.int('COINGECKO_MAX_CONCURRENT_REQUESTS', default=2)
+
+# Concurrent Alchemy batches per user sync, and in total across every worker
+# process (the global cap is shared through the cache)
+WALLET_SYNC_MAX_CONCURRENCY_PER_USER = env.int('WALLET_SYNC_MAX_CONCURRENCY_PER_USER', default=4)
+WALLET_SYNC_GLOBAL_MAX_CONCURRENCY = env.int('WALLET_SYNC_GLOBAL_MAX_CONCURRENCY', default=16)
+
+# A pending or running sync job without progress for this long is treated as dead
+WALLET_SYNC_JOB_STALE_SECONDS = env.int('WALLET_SYNC_JOB_STALE_SECONDS', default=300)
+
+# A user sync reuses wallets synced within the freshness window; the scheduler
+# refreshes due watched wallets in batches, each wallet every min-max interval.
+# Keep the min interval >= the freshness window: the scheduler skips wallets
+# still inside the window, so a shorter interval cannot refresh them sooner
+WALLET_FRESHNESS_SECONDS = env.int('WALLET_FRESHNESS_SECONDS', default=600)
+WALLET_REFRESH_BATCH_LIMIT = env.int('WALLET_REFRESH_BATCH_LIMIT', default=200)
+WALLET_REFRESH_MIN_INTERVAL_SECONDS = env.int('WALLET_REFRESH_MIN_INTERVAL_SECONDS', default=600)
+WALLET_REFRESH_MAX_INTERVAL_SECONDS = env.int('WALLET_REFRESH_MAX_INTERVAL_SECONDS', default=86400)
+
+# Lifetime of cached portfolio responses (invalidated earlier by version bumps)
+PORTFOLIO_CACHE_TIMEOUT = env.int('PORTFOLIO_CACHE_TIMEOUT', default=3600)
+
+# Portfolio history keeps daily points this long, then one point per week (0 keeps every day)
+SNAPSHOT_DAILY_RETENTION_DAYS = env.int('SNAPSHOT_DAILY_RETENTION_DAYS', default=90)